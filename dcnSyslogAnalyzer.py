@@ -1,44 +1,314 @@
 # Version 1.2.6 (20250326)
 import os
 import re
+import sys
+import bz2
 import csv
 import glob
+import gzip
+import lzma
+import math
+import heapq
+import queue
+import hashlib
+import sqlite3
+import argparse
 import datetime
-import matplotlib.pyplot as plt
+import ipaddress
+import threading
+import io
+import json
+import time
+import pstats
+import cProfile
+import functools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
 # Excel 2007 以後的行數上限約 1,048,576，此處取 1,048,575 為安全數值
 MAX_EXCEL_ROWS = 1048575
 
+# 串流讀檔的緩衝大小，以及 tqdm 進度更新的位元組間隔
+READ_BUFFER_BYTES = 1 << 20
+READ_PROGRESS_BYTES = 4 << 20
+
+# 輸入檔名：YYYYMM.txt，或壓縮封存的 YYYYMM.txt.gz / .bz2 / .xz / .zst
+INPUT_FILE_PATTERN = re.compile(r"\d{6}\.txt(\.(gz|bz2|xz|zst))?$")
+COMPRESSED_EXTENSIONS = (".gz", ".bz2", ".xz", ".zst")
+# 解壓縮讀取執行緒與解析之間的緩衝區塊數
+DECOMPRESS_QUEUE_DEPTH = 8
+
+# 每月統計快取 (SQLite)，統計邏輯或結構變更時須調高 CACHE_SCHEMA_VERSION 讓舊快取失效
+CACHE_FILE = "dcnSyslogCache.sqlite"
+CACHE_SCHEMA_VERSION = 1
+
+# 追蹤模式 (--follow)：檢查點檔名與用來辨識檔案是否被替換的檔頭長度
+FOLLOW_CHECKPOINT_FILE = "dcnSyslogFollow_{month}.json"
+FOLLOW_HEAD_BYTES = 4096
+
+# 每個輸出資料夾的執行統計，以及 --profile 的熱點摘要與原始 cProfile 資料 (前 N 個函式)
+RUN_METRICS_FILE = "runMetrics.json"
+PROFILE_SUMMARY_FILE = "runProfile.txt"
+PROFILE_DATA_FILE = "runProfile.prof"
+PROFILE_TOP = 30
+
+# 可選擇產生的報表 (--stages)；其中 DETAIL_STAGES 需要完整解析最新月份，counts / trend 只需每月統計
+REPORT_STAGES = ["severity", "analysis", "counts", "trend", "pie"]
+DETAIL_STAGES = {"severity", "analysis", "pie"}
+# --output-dir 的增量更新記錄 (每個類別各組報表的輸入指紋與輸出檔)
+MANIFEST_FILE = "dcnSyslogManifest.json"
+MANIFEST_VERSION = 1
+
+# 解析結果匯出 (--export-db)：每批寫入的筆數
+EXPORT_BATCH_ROWS = 50000
+
+# 爆量偵測 (--storm)：以日期 (1~31 日) 與時間切成每小時 / 每分鐘的時間區間
+STORM_HOURS = 31 * 24
+STORM_MINUTES = 31 * 24 * 60
+# 計數陣列大小固定：超過上限的設備 / syslog type 併入各類別的 "(other)"
+STORM_MAX_DEVICES = 128
+STORM_MAX_TYPES = 32
+# 以前 N 個區間為基準計算 z-score，同時需達到最低數量才列入報表
+STORM_WINDOW_HOURS = 24
+STORM_WINDOW_MINUTES = 60
+STORM_Z_THRESHOLD = 4.0
+STORM_MIN_HOUR_COUNT = 100
+STORM_MIN_MINUTE_COUNT = 20
+# 基準至少要有 N 個區間才計算 z-score (月初的區間沒有可比較的基準，不列入)
+STORM_MIN_BASELINE_HOURS = 6
+STORM_MIN_BASELINE_MINUTES = 15
+# 每累積 N 筆才一次寫入 NumPy 陣列，z-score 則每次計算 N 條時間序列
+STORM_BATCH = 65536
+STORM_SERIES_CHUNK = 16
+
+# 近似統計模式 (--sketch) 的預設誤差：
+#   epsilon：Space-Saving 容量為 1/epsilon，Count-Min 寬度為 e/epsilon，計數高估上限約為 epsilon × 總筆數
+#   delta：Count-Min 超過誤差上限的機率 (深度為 ln(1/delta))
+#   HyperLogLog 的相對標準誤差 (決定暫存器數量)
+SKETCH_EPSILON = 0.001
+SKETCH_DELTA = 0.01
+SKETCH_HLL_ERROR = 0.02
+# 每個 log type 追蹤的設備數 (圓餅圖只需要前 5 名)
+SKETCH_DEVICES_PER_TYPE = 32
+
+# 訊息範本歸納 (--templates，Drain 演算法)：
+#   含數字的 token (介面名稱、計數、IP…) 先遮罩為 <*> (以 lookbehind 固定從 token 開頭比對，避免逐字元重試)
+#   前綴樹深度 (syslog type、token 數之後再依前 N-2 個 token 分支)，每個節點的子節點上限
+#   與範本相同 token 比例達到門檻才歸入同一範本
+TEMPLATE_MASK_PATTERN = re.compile(r"(?<!\S)[^\s\d]*\d\S*")
+# 數字全部換成 0 的「形狀」：遮罩結果只取決於形狀，形狀相同的訊息可略過正規表示式
+TEMPLATE_SHAPE_TABLE = bytes.maketrans(b"123456789", b"000000000")
+TEMPLATE_PARAMETER = "<*>"
+TEMPLATE_DEPTH = 4
+TEMPLATE_MAX_CHILDREN = 100
+TEMPLATE_SIMILARITY = 0.5
+# 遮罩後的訊息 → 範本、訊息形狀 → 範本兩個快取各自的上限
+TEMPLATE_CACHE_LIMIT = 1 << 18
+
+# 預先編譯的擷取規則：severity (%FACILITY-SEV-MNEMONIC:)、syslog type (最後一個 "%...:")、log type ("%" 至空白)
+SEVERITY_PATTERN = re.compile(r"%\S+-(\d)-\S+:")
+SYSLOG_TYPE_PATTERN = re.compile(r"(%[^:]+):")
+LOG_TYPE_PATTERN = re.compile(r"(%\S+)")
+
+class SyslogRecord:
+    """
+    單行 syslog 解析後的欄位，每行只解析一次，後續所有輸出直接讀取欄位：
+      severity / device_ip / message 一定會填入；
+      day / time / syslog_type / log_type 僅在完整解析 (full=True) 時填入；
+      hostname 由分類時依設備清單填入。
+    """
+    __slots__ = ("severity", "device_ip", "hostname", "day", "time", "syslog_type", "log_type", "message")
+
+    def __init__(self, severity, device_ip, message, hostname=None, day=None, time=None, syslog_type=None,
+                 log_type=None):
+        self.severity = severity
+        self.device_ip = device_ip
+        self.hostname = hostname
+        self.day = day
+        self.time = time
+        self.syslog_type = syslog_type
+        self.log_type = log_type
+        self.message = message
+
+def parse_record(line, full=True):
+    """
+    以預先編譯的規則解析一行 (已 strip 的) syslog，無 severity 或欄位不足時回傳 None。
+    full=False 時只擷取 severity 與設備 IP (歷史統計使用)，省略其餘欄位的解析。
+    """
+    sev_match = SEVERITY_PATTERN.search(line)
+    if not sev_match:
+        return None
+    tokens = line.split(None, 4)
+    if len(tokens) < 4:
+        return None
+    record = SyslogRecord(int(sev_match.group(1)), tokens[3], line)
+    if full:
+        record.day = tokens[0] + " " + tokens[1]
+        record.time = tokens[2]
+        type_matches = SYSLOG_TYPE_PATTERN.findall(line)
+        record.syslog_type = type_matches[-1] if type_matches else "Unknown"
+        record.log_type = extract_log_type(line)
+    return record
+
 def extract_log_type(message):
     """
     從 log 訊息中擷取 log type：
     取從 "%" 開頭直到第一個空白字元為止的字串。
     若找不到則回傳 "Unknown"。
     """
-    match = re.search(r"(%\S+)", message)
+    match = LOG_TYPE_PATTERN.search(message)
     if match:
         return match.group(1)
     return "Unknown"
 
-def load_device_list():
+def find_device_list(directory="."):
     """
-    讀取符合 deviceList_v*.csv 檔案，預期每行格式為 "Type,Hostname,IP"，
-    建立並回傳兩個映射字典：
-      mapping_tfn: { IP: Hostname } (TFN 類)
-      mapping_twm: { IP: Hostname } (TWM 類)
-    若找不到符合的檔案，則回傳兩個空字典。
+    取得 directory 中 deviceList_v*.csv 檔案路徑，找不到時回傳 None。
     """
-    mapping_tfn = {}
-    mapping_twm = {}
-
     # 利用 glob 萬用字元取得符合的檔案清單
-    device_files = glob.glob("deviceList_v*.csv")
+    device_files = glob.glob(os.path.join(directory, "deviceList_v*.csv"))
     if not device_files:
-        return mapping_tfn, mapping_twm
-
+        return None
     # 手動控制只留一個版本，所以取第一個即可
-    device_file = device_files[0]
+    return device_files[0]
+
+def device_list_version(directory="."):
+    """
+    以設備清單檔名及內容雜湊表示目前的分類版本，供快取判斷分類結果是否仍有效。
+    """
+    device_file = find_device_list(directory)
+    if device_file is None:
+        return "none"
+    with open(device_file, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    return f"{os.path.basename(device_file)}:{digest}"
+
+# 設備清單固定先建立的類別 (即使清單中沒有也會輸出資料夾)，以及找不到設備時的類別
+DEFAULT_CATEGORIES = ["TFN", "TWM"]
+UNKNOWN_CATEGORY = "UNKNOWN"
+# 設備查詢快取的上限，避免 tokens[3] 不是 IP 的雜訊行讓快取無限成長
+DEVICE_CACHE_LIMIT = 1 << 20
+
+class DeviceIndex:
+    """
+    設備清單索引，一次查詢即可由設備 IP 取得 (類別, Hostname)：
+      - 精確 IP：字典查詢
+      - CIDR 網段 (例如管理網段 10.1.0.0/16)：依前綴長度分組的雜湊表，由長到短做最長前綴比對
+      - 類別來自 deviceList 的 Type 欄位，數量不限；找不到的設備歸類為 UNKNOWN
+    同一個 IP / 網段出現在多個類別時，以類別順序 (TFN、TWM、其餘依清單出現順序) 較前者為準，
+    同一類別內則以最後一筆為準。
+    查詢結果會快取，並附上 intern 過的 IP 字串，讓大量明細共用同一份 IP 字串。
+    """
+    def __init__(self):
+        self.categories = list(DEFAULT_CATEGORIES)
+        self.exact = {}
+        self.networks = {4: {}, 6: {}}
+        self.prefix_lengths = {4: [], 6: []}
+        self.cache = {}
+
+    @property
+    def all_categories(self):
+        """
+        所有輸出類別：設備清單中的類別，最後加上 UNKNOWN。
+        """
+        if UNKNOWN_CATEGORY in self.categories:
+            return list(self.categories)
+        return self.categories + [UNKNOWN_CATEGORY]
+
+    def _register(self, table, key, category, hostname):
+        existing = table.get(key)
+        if existing is not None and self.categories.index(existing[0]) < self.categories.index(category):
+            return
+        table[key] = (category, hostname)
+
+    def add(self, category, hostname, ip):
+        """
+        加入一筆設備；ip 含 "/" 時視為 CIDR 網段。網段格式錯誤時回傳 False。
+        """
+        network = None
+        if "/" in ip:
+            try:
+                network = ipaddress.ip_network(ip, strict=False)
+            except ValueError:
+                return False
+        if category not in self.categories:
+            self.categories.append(category)
+        if network is not None:
+            tables = self.networks[network.version]
+            if network.prefixlen not in tables:
+                tables[network.prefixlen] = {}
+                self.prefix_lengths[network.version] = sorted(tables, reverse=True)
+            self._register(tables[network.prefixlen], int(network.network_address), category, hostname)
+        else:
+            self._register(self.exact, sys.intern(ip), category, hostname)
+        self.cache.clear()
+        return True
+
+    def _match_network(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        value = int(address)
+        bits = address.max_prefixlen
+        tables = self.networks[address.version]
+        for prefixlen in self.prefix_lengths[address.version]:
+            shift = bits - prefixlen
+            match = tables[prefixlen].get(value >> shift << shift)
+            if match is not None:
+                return match
+        return None
+
+    def resolve(self, ip):
+        """
+        回傳 (類別, Hostname, intern 過的 IP)；找不到時為 (UNKNOWN, "N/A", IP)。
+        """
+        entry = self.cache.get(ip)
+        if entry is not None:
+            return entry
+        ip = sys.intern(ip)
+        match = self.exact.get(ip)
+        if match is None and (self.prefix_lengths[4] or self.prefix_lengths[6]):
+            match = self._match_network(ip)
+        category, hostname = match if match is not None else (UNKNOWN_CATEGORY, "N/A")
+        entry = (category, hostname, ip)
+        if len(self.cache) < DEVICE_CACHE_LIMIT:
+            self.cache[ip] = entry
+        return entry
+
+def load_device_list(directory="."):
+    """
+    讀取 directory 中符合 deviceList_v*.csv 的檔案，預期每行格式為 "Type,Hostname,IP"，
+    IP 欄位可為單一 IP 或 CIDR 網段，Type 欄位可為任意類別 (不分大小寫)。
+    建立並回傳 DeviceIndex；若找不到符合的檔案，則回傳只有預設類別的空索引。
+    """
+    index = DeviceIndex()
+
+    device_file = find_device_list(directory)
+    if device_file is None:
+        return index
 
     with open(device_file, "r", encoding="utf-8") as f:
         reader = csv.reader(f)
@@ -48,13 +318,928 @@ def load_device_list():
             dev_type = row[0].strip().upper()
             hostname = row[1].strip()
             ip = row[2].strip()
-            if dev_type == "TFN":
-                mapping_tfn[ip] = hostname
-            elif dev_type == "TWM":
-                mapping_twm[ip] = hostname
+            if not dev_type or not ip:
+                continue
+            index.add(dev_type, hostname, ip)
+
+    return index
+
+def new_counts():
+    return {'sev0_3': 0, 'sev4_6': 0, 'total': 0}
+
+def month_key(file):
+    """
+    由檔名取得月份鍵值 YYYYMM (適用於 YYYYMM.txt 及其壓縮檔)。
+    """
+    return os.path.basename(file)[:6]
+
+def is_compressed(file):
+    return file.endswith(COMPRESSED_EXTENSIONS)
+
+def find_input_files(directory="."):
+    """
+    掃描目錄下所有 YYYYMM.txt 及其壓縮檔；同一月份有多個檔案時只取一個，優先使用未壓縮檔。
+    """
+    files = [f if directory == "." else os.path.join(directory, f)
+             for f in glob.glob("*.txt*", root_dir=directory) if INPUT_FILE_PATTERN.match(f)]
+    chosen = {}
+    for f in sorted(files, key=is_compressed):
+        chosen.setdefault(month_key(f), f)
+    return [f for f in files if chosen[month_key(f)] == f]
+
+def open_decompressor(file, raw):
+    """
+    依副檔名將已開啟的二進位檔案包裝成串流解壓縮的讀取物件，不產生暫存檔。
+    """
+    if file.endswith(".gz"):
+        return gzip.GzipFile(fileobj=raw)
+    if file.endswith(".bz2"):
+        return bz2.BZ2File(raw)
+    if file.endswith(".xz"):
+        return lzma.LZMAFile(raw)
+    if zstandard is None:
+        raise RuntimeError(f"Reading {file} requires the 'zstandard' package (pip install zstandard)")
+    return zstandard.ZstdDecompressor().stream_reader(raw)
+
+def iter_chunks_threaded(stream, chunk_size=READ_BUFFER_BYTES, depth=DECOMPRESS_QUEUE_DEPTH):
+    """
+    由背景執行緒持續讀取 (解壓縮) stream 的區塊並放入有上限的佇列，
+    使解壓縮 (gzip / bz2 / lzma / zstd 皆會釋放 GIL) 與主執行緒的解析同時進行。
+    """
+    chunks = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def reader():
+        try:
+            while not stop.is_set():
+                chunk = stream.read(chunk_size)
+                put(chunk)
+                if not chunk:
+                    return
+        except BaseException as exc:
+            put(exc)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = chunks.get()
+            if isinstance(item, BaseException):
+                raise item
+            if not item:
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+def iter_compressed_lines(file, desc, show_progress=True):
+    """
+    串流解壓縮並逐行回傳；進度以已讀取的壓縮檔位元組數計算。
+    """
+    total_bytes = os.path.getsize(file)
+    with open(file, "rb", buffering=READ_BUFFER_BYTES) as raw, \
+            tqdm(total=total_bytes, desc=desc, unit="B", unit_scale=True,
+                 disable=not show_progress) as progress:
+        stream = open_decompressor(file, raw)
+        chunks = iter_chunks_threaded(stream)
+        reported = 0
+        remainder = b""
+        try:
+            for chunk in chunks:
+                position = raw.tell()
+                if position - reported >= READ_PROGRESS_BYTES:
+                    progress.update(position - reported)
+                    reported = position
+                lines = (remainder + chunk).split(b"\n")
+                remainder = lines.pop()
+                for raw_line in lines:
+                    yield raw_line.decode("utf-8")
+        finally:
+            chunks.close()
+            stream.close()
+        if remainder:
+            yield remainder.decode("utf-8")
+        progress.update(total_bytes - reported)
+
+def iter_lines(file, desc, show_progress=True, start=0, end=None):
+    """
+    以緩衝的二進位串流逐行讀取檔案並解碼為字串，不會把整個檔案載入記憶體。
+    tqdm 進度以已讀取的位元組數計算，每累積 READ_PROGRESS_BYTES 才更新一次以降低額外負擔。
+    show_progress=False 時不顯示進度條 (平行模式的子行程使用)。
+    start / end 指定只讀取 [start, end) 位元組範圍，範圍須對齊行首 (見 split_file_ranges)。
+    壓縮檔 (.gz / .bz2 / .xz / .zst) 一律整檔串流解壓縮，不支援位元組範圍。
+    """
+    if is_compressed(file):
+        yield from iter_compressed_lines(file, desc, show_progress)
+        return
+    if end is None:
+        end = os.path.getsize(file)
+    with open(file, "rb", buffering=READ_BUFFER_BYTES) as f, \
+            tqdm(total=end - start, desc=desc, unit="B", unit_scale=True,
+                 disable=not show_progress) as progress:
+        f.seek(start)
+        position = start
+        pending = 0
+        for raw in f:
+            if position >= end:
+                break
+            position += len(raw)
+            pending += len(raw)
+            if pending >= READ_PROGRESS_BYTES:
+                progress.update(pending)
+                pending = 0
+            yield raw.decode("utf-8")
+        progress.update(pending)
+
+def split_file_ranges(file, shards):
+    """
+    將檔案切成約 shards 等份的 [start, end) 位元組範圍，每個邊界都對齊到下一行的行首，
+    因此每一行只會落在一個範圍內。檔案太小時實際份數可能少於 shards。
+    """
+    size = os.path.getsize(file)
+    bounds = [0]
+    with open(file, "rb") as f:
+        for i in range(1, shards):
+            target = size * i // shards
+            if target <= bounds[-1]:
+                continue
+            f.seek(target - 1)
+            f.readline()
+            position = f.tell()
+            if bounds[-1] < position < size:
+                bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def new_ingest_result(categories, sinks=None):
+    """
+    建立單一檔案的統計結構，每個類別 (DeviceIndex.all_categories) 各一份：
+      counts:   {'sev0_3', 'sev4_6', 'total'}，歷史折線圖與最新月份計數共用
+      severity: { syslog_type: {'severity', 'count'} }，僅 detail 模式填入
+      sink:     Sev0-3 明細的串流輸出 (DetailSink)，由 sinks={category: DetailSink} 指定 (可只指定部分類別)
+      rows:     未指定 sink 時暫存的 Sev0-3 明細 (SyslogRecord，已填入 hostname)，僅 detail 模式填入
+    """
+    return {category: {"counts": new_counts(), "severity": {}, "rows": [],
+                       "sink": sinks.get(category) if sinks else None}
+            for category in categories}
+
+def ingest_file(file, index, detail=False, show_progress=True, start=0, end=None,
+                sinks=None, keep_rows=True, desc=None, exporter=None, histogram=None, stats=None):
+    """
+    單次讀取 log 檔並同時餵給所有統計：
+      - 歷史統計 (sev0_3 / sev4_6 / total)，每個檔案都會計算
+      - detail=True 時 (最新月份) 另外統計各 syslog type 數量並保留 Sev0-3 明細
+    start / end 可限定只處理檔案中的某個位元組範圍 (分片平行處理及追蹤模式使用)。
+    sinks 指定時 Sev0-3 明細直接串流寫出，不保留在記憶體中；keep_rows=False 則完全不保留明細。
+    exporter 指定時每一筆解析結果 (不限 severity) 都會匯出，月份取自檔名。
+    histogram 指定時另外累計每小時 / 每分鐘的數量 (StormHistogram)。
+    stats (new_read_stats()) 指定時累加讀取的檔案數、行數與位元組數。
+    回傳 new_ingest_result() 結構。
+    """
+    result = new_ingest_result(index.all_categories, sinks)
+    if desc is None:
+        desc = f"Processing Latest File {file}" if detail else f"Historical Processing {file}"
+    if exporter is not None:
+        exporter.begin_month(month_key(file))
+    lines_read = ingest_lines(result, iter_lines(file, desc, show_progress, start, end), index, detail, keep_rows,
+                              exporter, histogram)
+    if stats is not None:
+        stats["files"] += 1
+        stats["lines"] += lines_read
+        stats["bytes"] += (os.path.getsize(file) if end is None else end) - start
+    if exporter is not None:
+        exporter.end_month()
+    if histogram is not None:
+        histogram.flush()
+    return result
 
-    return mapping_tfn, mapping_twm
+def ingest_lines(result, lines, index, detail=False, keep_rows=True, exporter=None, histogram=None):
+    """
+    解析並分類任意來源的 syslog 行 (檔案、網路接收器)，將統計累加到 result (new_ingest_result() 結構)。
+    histogram (StormHistogram) 指定時 Sev0-6 的每一筆都會計入時間區間統計。
+    回傳讀取的行數 (含空白行與無法解析的行)。
+    """
+    # 直接查詢 DeviceIndex 的快取，只有第一次出現的 IP 才需要呼叫 resolve
+    device_cache = index.cache
+    resolve = index.resolve
+    full = detail or exporter is not None or histogram is not None
+    lines_read = 0
+    for lines_read, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        record = parse_record(line, full=full)
+        if record is None:
+            continue
+        severity = record.severity
+        device = device_cache.get(record.device_ip)
+        if device is None:
+            device = resolve(record.device_ip)
+        category, hostname, record.device_ip = device
+        if exporter is not None:
+            record.hostname = hostname
+            exporter.add(category, record)
+        if histogram is not None and 0 <= severity <= 6:
+            record.hostname = hostname
+            histogram.add(category, record)
+        state = result[category]
+        counts = state["counts"]
+        if detail and 0 <= severity <= 6 and state["sink"] is not None and state["sink"].sketch:
+            record.hostname = hostname
+            state["sink"].add_type(record)
+        elif detail and 0 <= severity <= 6:
+            syslog_type = record.syslog_type
+            severity_counts = state["severity"]
+            if syslog_type not in severity_counts:
+                severity_counts[syslog_type] = {'severity': severity, 'count': 0}
+            severity_counts[syslog_type]['count'] += 1
+        if 0 <= severity <= 3:
+            counts['sev0_3'] += 1
+            if detail:
+                record.hostname = hostname
+                if state["sink"] is not None:
+                    state["sink"].add(record)
+                elif keep_rows:
+                    state["rows"].append(record)
+        elif 4 <= severity <= 6:
+            counts['sev4_6'] += 1
+        counts['total'] += 1
+    return lines_read
+
+def new_read_stats():
+    return {"files": 0, "lines": 0, "bytes": 0}
+
+def merge_read_stats(target, part):
+    for key, value in part.items():
+        target[key] += value
+
+# 平行模式下子行程共用的設備索引，由 init_count_worker 於行程啟動時設定一次，避免每個工作重複傳送
+_worker_index = None
+
+def init_count_worker(index):
+    global _worker_index
+    _worker_index = index
+
+def result_counts(result):
+    """
+    從 new_ingest_result() 結構取出精簡的 {category: counts} 計數。
+    """
+    return {category: state["counts"] for category, state in result.items()}
+
+def count_file_worker(file):
+    """
+    子行程工作：統計單一歷史月份檔案，只回傳精簡的 {category: counts} 計數與讀取統計。
+    """
+    stats = new_read_stats()
+    return result_counts(ingest_file(file, _worker_index, show_progress=False, stats=stats)), stats
+
+def merge_ingest_result(target, part):
+    """
+    將 part 的統計併入 target (兩者皆為 new_ingest_result() 結構)。
+    part 必須依檔案順序依序合併：syslog type 保留第一次出現的順序與 severity，
+    明細列接在後面 (target 有 sink 時直接寫出)。
+    """
+    for category, part_state in part.items():
+        target_state = target[category]
+        for key, value in part_state["counts"].items():
+            target_state["counts"][key] += value
+        severity_counts = target_state["severity"]
+        for syslog_type, data in part_state["severity"].items():
+            if syslog_type in severity_counts:
+                severity_counts[syslog_type]['count'] += data['count']
+            else:
+                severity_counts[syslog_type] = data
+        if target_state["sink"] is not None:
+            for record in part_state["rows"]:
+                target_state["sink"].add(record)
+        else:
+            target_state["rows"].extend(part_state["rows"])
+    return target
+
+def ingest_shard_worker(file, start, end):
+    """
+    子行程工作：完整分析 (detail 模式) 檔案中的一個位元組範圍，回傳統計與讀取統計。
+    """
+    stats = new_read_stats()
+    return ingest_file(file, _worker_index, detail=True, show_progress=False, start=start, end=end,
+                       stats=stats), stats
+
+def ingest_file_sharded(executor, file, index, shards, sinks=None, stats=None):
+    """
+    將單一檔案切成對齊行首的位元組範圍交給行程池分析，再依檔案順序合併，
+    因此 Sev0-3 明細列的順序與逐行處理相同。
+    """
+    ranges = split_file_ranges(file, shards)
+    futures = [executor.submit(ingest_shard_worker, file, start, end) for start, end in ranges]
+    result = new_ingest_result(index.all_categories, sinks)
+    for future in tqdm(futures, desc=f"Processing Latest File {file} ({len(ranges)} shards)"):
+        part, part_stats = future.result()
+        merge_ingest_result(result, part)
+        if stats is not None:
+            merge_read_stats(stats, part_stats)
+    if stats is not None:
+        # 分片各自計入一次，整個檔案只算一個
+        stats["files"] -= len(ranges) - 1
+    return result
+
+def file_fingerprint(file, with_hash=False):
+    """
+    以路徑、大小與修改時間 (可選內容雜湊) 識別檔案內容，作為快取鍵值。
+    """
+    stat = os.stat(file)
+    content_hash = None
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(READ_BUFFER_BYTES), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+    return {"path": os.path.abspath(file), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "hash": content_hash}
+
+def open_count_cache(cache_file, rebuild=False):
+    """
+    開啟每月統計快取資料庫；rebuild=True 或結構版本不符時清空所有快取。
+    """
+    conn = sqlite3.connect(cache_file)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if rebuild or version != CACHE_SCHEMA_VERSION:
+        conn.execute("DROP TABLE IF EXISTS month_counts")
+        conn.execute(f"PRAGMA user_version = {CACHE_SCHEMA_VERSION}")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS month_counts (
+            path TEXT NOT NULL,
+            category TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            content_hash TEXT,
+            device_version TEXT NOT NULL,
+            sev0_3 INTEGER NOT NULL,
+            sev4_6 INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            PRIMARY KEY (path, category)
+        )""")
+    conn.commit()
+    return conn
+
+def load_cached_counts(conn, fingerprint, device_version, categories):
+    """
+    查詢檔案的快取計數，檔案大小、修改時間、設備清單版本 (及要求時的內容雜湊) 皆相符才視為有效。
+    有效時回傳 {category: counts}，否則回傳 None。
+    """
+    rows = conn.execute(
+        "SELECT category, size, mtime_ns, content_hash, device_version, sev0_3, sev4_6, total "
+        "FROM month_counts WHERE path = ?", (fingerprint["path"],)).fetchall()
+    counts = {}
+    for category, size, mtime_ns, content_hash, cached_version, sev0_3, sev4_6, total in rows:
+        if size != fingerprint["size"] or mtime_ns != fingerprint["mtime_ns"] or cached_version != device_version:
+            return None
+        if fingerprint["hash"] is not None and content_hash != fingerprint["hash"]:
+            return None
+        counts[category] = {'sev0_3': sev0_3, 'sev4_6': sev4_6, 'total': total}
+    if any(category not in counts for category in categories):
+        return None
+    return counts
+
+def store_cached_counts(conn, fingerprint, device_version, counts):
+    conn.execute("DELETE FROM month_counts WHERE path = ?", (fingerprint["path"],))
+    conn.executemany(
+        "INSERT INTO month_counts (path, category, size, mtime_ns, content_hash, device_version, "
+        "sev0_3, sev4_6, total) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(fingerprint["path"], category, fingerprint["size"], fingerprint["mtime_ns"], fingerprint["hash"],
+          device_version, data['sev0_3'], data['sev4_6'], data['total'])
+         for category, data in counts.items()])
+
+def peak_rss_mb(children=False):
+    """
+    目前行程 (children=True 時為已結束的子行程中最大者) 的記憶體峰值 (MB)；
+    不支援 resource 模組的平台 (Windows) 回傳 None。
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux 單位為 KB，macOS 為 bytes
+    return round(peak / (1 << 20) if sys.platform == "darwin" else peak / 1024, 1)
+
+def cpu_seconds():
+    # 本行程與已結束子行程 (行程池) 的 user + system 時間
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+class RunMetrics:
+    """
+    單次分析的執行統計：各階段的呼叫次數、經過時間、CPU 時間 (含行程池子行程)、
+    階段結束時行程至今的記憶體峰值 (peak_rss_mb_so_far；ru_maxrss 只有整個行程的峰值，不是該階段自己的峰值)，
+    以及讀取的檔案 / 行數 / 位元組數。結束時以 JSON 寫入每個輸出資料夾的 runMetrics.json。
+    """
+    def __init__(self, argv=None):
+        self.started = datetime.datetime.now()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = cpu_seconds()
+        self.argv = list(sys.argv[1:] if argv is None else argv)
+        self.stages = {}
+        self.reads = new_read_stats()
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        wall_start = time.perf_counter()
+        cpu_start = cpu_seconds()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+            entry["calls"] += 1
+            entry["wall_seconds"] += time.perf_counter() - wall_start
+            entry["cpu_seconds"] += cpu_seconds() - cpu_start
+            entry["peak_rss_mb_so_far"] = peak_rss_mb()
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self):
+        wall = time.perf_counter() - self.wall_start
+        # 讀取速度以 ingest 階段的時間計算 (不含輸出與繪圖)
+        ingest_wall = self.stages.get("ingest", {}).get("wall_seconds")
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "argv": self.argv,
+            "wall_seconds": round(wall, 3),
+            "cpu_seconds": round(cpu_seconds() - self.cpu_start, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_child_rss_mb": peak_rss_mb(children=True),
+            "input": dict(self.reads,
+                          lines_per_second=round(self.reads["lines"] / ingest_wall) if ingest_wall else None,
+                          mb_per_second=round(self.reads["bytes"] / (1 << 20) / ingest_wall, 2) if ingest_wall else None),
+            "counters": self.counters,
+            "stages": {name: {"calls": entry["calls"], "wall_seconds": round(entry["wall_seconds"], 3),
+                              "cpu_seconds": round(entry["cpu_seconds"], 3),
+                              "peak_rss_mb_so_far": entry["peak_rss_mb_so_far"]}
+                       for name, entry in self.stages.items()},
+        }
+
+    def write(self, out_folder, extra=None):
+        data = self.as_dict()
+        if extra:
+            data.update(extra)
+        data["output_bytes"] = sum(os.path.getsize(os.path.join(out_folder, name)) for name in os.listdir(out_folder))
+        with open(os.path.join(out_folder, RUN_METRICS_FILE), "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+# 目前執行中的 RunMetrics (由 run_analysis 設定)，未設定時 @metered 的函式不做任何統計
+_run_metrics = None
+
+def metered(function):
+    """
+    裝飾器：有執行統計時，將每次呼叫以函式名稱計為一個階段。
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _run_metrics is None:
+            return function(*args, **kwargs)
+        with _run_metrics.stage(function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
+
+EXPORT_FIELDS = ["month", "day", "severity", "device_ip", "hostname", "category", "syslog_type", "log_type",
+                 "message"]
+
+class SqliteRecordExporter:
+    """
+    將解析後的每一筆 log 以交易批次寫入 SQLite 的 records 資料表，供事後直接查詢
+    (例如某天哪些設備暴增)。同一月份重新匯出時會先刪除舊資料。
+    資料表原本是空的或 bulk=True (一次匯出多個月份) 時，整次匯出期間移除 (device_ip, day) 與 (syslog_type)
+    索引，close() 時只重建一次；其餘情況 (在既有資料上加入新月份) 保留索引，避免每次都對整個資料表重建。
+    """
+    INDEXES = {
+        "idx_records_device_day": "records (device_ip, day)",
+        "idx_records_type": "records (syslog_type)",
+    }
+
+    def __init__(self, path, bulk=False):
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                month TEXT NOT NULL,
+                day TEXT,
+                severity INTEGER NOT NULL,
+                device_ip TEXT NOT NULL,
+                hostname TEXT,
+                category TEXT NOT NULL,
+                syslog_type TEXT,
+                log_type TEXT,
+                message TEXT NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_records_month ON records (month)")
+        self.month = None
+        self.rows = []
+        self.drop_indexes = bulk or self.conn.execute("SELECT 1 FROM records LIMIT 1").fetchone() is None
+        for name, definition in self.INDEXES.items():
+            if self.drop_indexes:
+                self.conn.execute(f"DROP INDEX IF EXISTS {name}")
+            else:
+                # 上次大量匯出中斷時索引可能尚未重建
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+    def begin_month(self, month):
+        self.month = month
+        self.conn.execute("BEGIN")
+        self.conn.execute("DELETE FROM records WHERE month = ?", (month,))
+
+    def add(self, category, record):
+        self.rows.append((self.month, record.day, record.severity, record.device_ip, record.hostname, category,
+                          record.syslog_type, record.log_type, record.message))
+        if len(self.rows) >= EXPORT_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self.rows:
+            self.conn.executemany(f"INSERT INTO records ({', '.join(EXPORT_FIELDS)}) VALUES "
+                                  f"({', '.join('?' * len(EXPORT_FIELDS))})", self.rows)
+            self.rows = []
+
+    def end_month(self):
+        self._flush()
+        self.conn.execute("COMMIT")
+
+    def close(self):
+        if self.drop_indexes:
+            for name, definition in self.INDEXES.items():
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+        self.conn.close()
+
+class ParquetRecordExporter:
+    """
+    將解析後的每一筆 log 寫入 {目錄}/{YYYYMM}.parquet (需要 pyarrow)，欄位與 SQLite 匯出相同。
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.schema = pyarrow.schema([
+            ("month", pyarrow.string()), ("day", pyarrow.string()), ("severity", pyarrow.int8()),
+            ("device_ip", pyarrow.string()), ("hostname", pyarrow.string()), ("category", pyarrow.string()),
+            ("syslog_type", pyarrow.string()), ("log_type", pyarrow.string()), ("message", pyarrow.string()),
+        ])
+        self.month = None
+        self.writer = None
+        self.rows = []
 
+    def begin_month(self, month):
+        self.month = month
+        self.writer = pyarrow.parquet.ParquetWriter(os.path.join(self.directory, f"{month}.parquet"), self.schema)
+
+    def add(self, category, record):
+        self.rows.append((self.month, record.day, record.severity, record.device_ip, record.hostname, category,
+                          record.syslog_type, record.log_type, record.message))
+        if len(self.rows) >= EXPORT_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self.rows:
+            columns = [pyarrow.array(column, type=field.type) for column, field in zip(zip(*self.rows), self.schema)]
+            self.writer.write_table(pyarrow.Table.from_arrays(columns, schema=self.schema))
+            self.rows = []
+
+    def end_month(self):
+        self._flush()
+        self.writer.close()
+        self.writer = None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def open_record_exporter(path, export_format, bulk=False):
+    if export_format == "parquet":
+        if pyarrow is None:
+            raise RuntimeError("Parquet export requires the 'pyarrow' package (pip install pyarrow)")
+        return ParquetRecordExporter(path)
+    return SqliteRecordExporter(path, bulk)
+
+def stable_hash(key):
+    """
+    近似統計用的 64 位元雜湊：內建 hash() 對字串每次執行都不同，改用 blake2b 讓同一份輸入的 --sketch 報表可重現。
+    key 為字串或字串 tuple。
+    """
+    if isinstance(key, tuple):
+        return _blake2b_64("\x1f".join(map(str, key)))
+    return _cached_text_hash(key)
+
+def _blake2b_64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8", "replace"), digest_size=8).digest(), "little")
+
+# 設備 IP 與 syslog type 重複出現的比例很高，快取最近的結果 (組合鍵幾乎不重複，不快取)
+_cached_text_hash = functools.lru_cache(maxsize=4096)(_blake2b_64)
+
+class CountMinSketch:
+    """
+    Count-Min 頻率估計：width × depth 的計數表，估計值不會低於實際值，
+    並以機率 1 - delta 高估不超過 epsilon × 總筆數。
+    """
+    def __init__(self, epsilon=SKETCH_EPSILON, delta=SKETCH_DELTA):
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.tables = [[0] * self.width for _ in range(self.depth)]
+
+    def add(self, key):
+        # 由一次雜湊推導 depth 個雜湊值 (Kirsch-Mitzenmacher)
+        value = stable_hash(key)
+        column = value & 0xFFFFFFFF
+        step = ((value >> 32) & 0xFFFFFFFF) | 1
+        width = self.width
+        for table in self.tables:
+            table[column % width] += 1
+            column += step
+
+    def estimate(self, key):
+        value = stable_hash(key)
+        column = value & 0xFFFFFFFF
+        step = ((value >> 32) & 0xFFFFFFFF) | 1
+        width = self.width
+        counts = []
+        for table in self.tables:
+            counts.append(table[column % width])
+            column += step
+        return min(counts)
+
+class HyperLogLog:
+    """
+    HyperLogLog 基數估計：以 2^precision 個暫存器估計不重複的數量，相對標準誤差約 1.04 / sqrt(2^precision)。
+    """
+    def __init__(self, error=SKETCH_HLL_ERROR):
+        self.precision = min(max(math.ceil(math.log2((1.04 / error) ** 2)), 4), 16)
+        self.registers = bytearray(1 << self.precision)
+
+    def add(self, item):
+        value = stable_hash(item)
+        bits = 64 - self.precision
+        rank = bits - (value & ((1 << bits) - 1)).bit_length() + 1
+        register = value >> bits
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def estimate(self):
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        raw = alpha * size * size / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * size and zeros:
+            # 小基數時改用線性計數
+            return round(size * math.log(size / zeros))
+        return round(raw)
+
+class SpaceSaving:
+    """
+    Space-Saving 高頻項目統計：最多同時追蹤 capacity 個鍵，滿了就取代計數最小者並繼承其計數。
+    每個鍵記錄 [count, error, value]：實際次數介於 count - error 與 count 之間，
+    出現次數超過 總筆數 / capacity 的鍵保證會被追蹤。value 在鍵開始被追蹤時為 None，由呼叫端填入。
+    最小計數以 heap 維護，heap 中的計數只會偏低 (不在每次累加時更新)，取出時再校正。
+    """
+    def __init__(self, capacity):
+        self.capacity = max(capacity, 1)
+        self.entries = {}
+        self.heap = []
+        self.sequence = 0
+
+    def add(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry[0] += 1
+            return entry
+        count = 0
+        if len(self.entries) >= self.capacity:
+            while True:
+                stale_count, _, victim = self.heap[0]
+                actual = self.entries[victim][0]
+                if actual == stale_count:
+                    heapq.heappop(self.heap)
+                    break
+                self.sequence += 1
+                heapq.heapreplace(self.heap, (actual, self.sequence, victim))
+            count = actual
+            del self.entries[victim]
+        entry = self.entries[key] = [count + 1, count, None]
+        self.sequence += 1
+        heapq.heappush(self.heap, (count + 1, self.sequence, key))
+        return entry
+
+    def top(self, limit=None):
+        items = sorted(self.entries.items(), key=lambda item: item[1][0], reverse=True)
+        return items if limit is None else items[:limit]
+
+class SketchDetailSink:
+    """
+    DetailSink 的固定記憶體版本 (--sketch)：logAnalysis 明細同樣串流寫出，
+    但 severityCount、logAnalysis_simple 與圓餅圖改由 sketch 估計，記憶體只與誤差設定有關：
+      - syslog type：Space-Saving 追蹤前 1/epsilon 個 type，次數取 Count-Min 與 Space-Saving 的較小值，
+        各 type 的不重複設備數以 HyperLogLog 估計
+      - logAnalysis_simple：Space-Saving 只保留出現最多的 (Device IP, 日期, syslog type) 群組
+      - 圓餅圖：Space-Saving 追蹤 log type，每個 type 再以 Space-Saving 追蹤前幾名設備
+    type 被取代後重新開始追蹤時，其不重複設備數與設備排名從頭累計。
+    """
+    sketch = True
+
+    def __init__(self, out_folder, month_suffix, epsilon=SKETCH_EPSILON, delta=SKETCH_DELTA,
+                 hll_error=SKETCH_HLL_ERROR, devices_per_type=SKETCH_DEVICES_PER_TYPE, templates=False,
+                 write_rows=True):
+        self.writer = RollingCsvWriter(out_folder, "logAnalysis", month_suffix, LOG_ANALYSIS_FIELDS) \
+            if write_rows else None
+        self.templates = TemplateMiner() if templates else None
+        capacity = math.ceil(1 / epsilon)
+        self.hll_error = hll_error
+        self.devices_per_type = devices_per_type
+        self.types = SpaceSaving(capacity)
+        self.type_frequency = CountMinSketch(epsilon, delta)
+        self.simple = SpaceSaving(capacity)
+        self.simple_frequency = CountMinSketch(epsilon, delta)
+        self.pie = SpaceSaving(capacity)
+
+    def add_type(self, record):
+        # Sev0-6 每筆呼叫一次，取代 new_ingest_result() 的 severity 字典
+        entry = self.types.add(record.syslog_type)
+        if entry[2] is None:
+            entry[2] = [record.severity, HyperLogLog(self.hll_error)]
+        entry[2][1].add(record.device_ip)
+        self.type_frequency.add(record.syslog_type)
+
+    def add(self, record):
+        if self.writer is not None:
+            self.writer.writerow(log_analysis_row(record))
+        key = (record.device_ip, record.day, record.syslog_type)
+        entry = self.simple.add(key)
+        if entry[2] is None:
+            entry[2] = record
+        self.simple_frequency.add(key)
+        entry = self.pie.add(record.log_type)
+        if entry[2] is None:
+            entry[2] = SpaceSaving(self.devices_per_type)
+        entry[2].add(record.hostname)
+        if self.templates is not None:
+            self.templates.add(record)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    @property
+    def severity_counts(self):
+        # 與 new_ingest_result() 的 severity 相同格式：{ syslog_type: {'severity', 'count'} }
+        return {syslog_type: {'severity': value[0], 'count': min(count, self.type_frequency.estimate(syslog_type))}
+                for syslog_type, (count, error, value) in self.types.entries.items()}
+
+    @property
+    def simple_dict(self):
+        # 與 add_simple_row 相同格式：{ (Device IP, day, syslog type): [SyslogRecord, 次數] }
+        return {key: [record, min(count, self.simple_frequency.estimate(key))]
+                for key, (count, error, record) in self.simple.entries.items()}
+
+    @property
+    def pie_data(self):
+        # 與 add_pie_row 相同格式，只列前 5 名設備，其餘次數放在 None 鍵 (pie_chart_specs 併入 "Other")
+        data = {}
+        for log_type, (count, error, devices) in self.pie.entries.items():
+            device_counts = {hostname: device_count for hostname, (device_count, _, _) in devices.top(5)}
+            remainder = count - sum(device_counts.values())
+            if remainder > 0:
+                device_counts[None] = remainder
+            data[log_type] = device_counts
+        return data
+
+    def type_summary(self):
+        """
+        sketchTypes CSV 的內容：估計次數、保證下限 (Space-Saving 的 count - error) 與不重複設備數。
+        """
+        rows = []
+        for syslog_type, (count, error, (severity, devices)) in self.types.top():
+            rows.append([syslog_type, severity, min(count, self.type_frequency.estimate(syslog_type)),
+                         count - error, devices.estimate()])
+        return rows
+
+class StormHistogram:
+    """
+    最新月份的時間區間統計 (需要 numpy)，記憶體用量固定、與行數無關：
+      hour_counts:   (小時, 設備, syslog type)
+      minute_counts: (分鐘, 設備)，不再細分 syslog type：(分鐘, 設備, type) 在預設上限下需約 700 MB
+    設備與 syslog type 依第一次出現的順序編號，超過 max_devices / max_types 時
+    設備併入所屬類別的 "(other)"，syslog type 併入 "(other)"。
+    逐筆只記錄編號，每 STORM_BATCH 筆再以 numpy.add.at 一次寫入陣列。
+    """
+    def __init__(self, categories, max_devices=STORM_MAX_DEVICES, max_types=STORM_MAX_TYPES):
+        if numpy is None:
+            raise RuntimeError("Storm detection requires the 'numpy' package (pip install numpy)")
+        # 前 len(categories) 個設備編號保留給各類別的 "(other)"
+        self.devices = [("(other)", "", category) for category in categories]
+        self.device_ids = {}
+        self.other_device = {category: device_id for device_id, category in enumerate(categories)}
+        self.max_devices = max(max_devices, len(categories) + 1)
+        self.types = ["(other)"]
+        self.type_ids = {}
+        self.max_types = max(max_types, 2)
+        self.hour_counts = numpy.zeros((STORM_HOURS, self.max_devices, self.max_types), dtype=numpy.uint32)
+        self.minute_counts = numpy.zeros((STORM_MINUTES, self.max_devices), dtype=numpy.uint32)
+        self.pending_minutes = []
+        self.pending_devices = []
+        self.pending_types = []
+
+    def add(self, category, record):
+        try:
+            clock = record.time
+            minute = (int(record.day[4:]) - 1) * 1440 + int(clock[:2]) * 60 + int(clock[3:5])
+        except (TypeError, ValueError):
+            return
+        if not 0 <= minute < STORM_MINUTES:
+            return
+        device_id = self.device_ids.get(record.device_ip)
+        if device_id is None:
+            if len(self.devices) < self.max_devices:
+                device_id = self.device_ids[record.device_ip] = len(self.devices)
+                self.devices.append((record.device_ip, record.hostname, category))
+            else:
+                device_id = self.other_device[category]
+        type_id = self.type_ids.get(record.syslog_type)
+        if type_id is None:
+            if len(self.types) < self.max_types:
+                type_id = self.type_ids[record.syslog_type] = len(self.types)
+                self.types.append(record.syslog_type)
+            else:
+                type_id = 0
+        self.pending_minutes.append(minute)
+        self.pending_devices.append(device_id)
+        self.pending_types.append(type_id)
+        if len(self.pending_minutes) >= STORM_BATCH:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_minutes:
+            return
+        minutes = numpy.array(self.pending_minutes, dtype=numpy.intp)
+        devices = numpy.array(self.pending_devices, dtype=numpy.intp)
+        types = numpy.array(self.pending_types, dtype=numpy.intp)
+        numpy.add.at(self.minute_counts, (minutes, devices), 1)
+        numpy.add.at(self.hour_counts, (minutes // 60, devices, types), 1)
+        self.pending_minutes = []
+        self.pending_devices = []
+        self.pending_types = []
+
+    def detect(self, threshold=STORM_Z_THRESHOLD):
+        """
+        回傳爆量區間：[(bucket, 區間編號, 設備編號, type 編號 或 None, 數量, 基準平均, z-score)]。
+        每小時以 (設備, syslog type)、每分鐘以設備為一條時間序列。
+        """
+        self.flush()
+        storms = []
+        hourly = self.hour_counts.reshape(STORM_HOURS, -1)
+        for hour, series, count, mean, score in rolling_bursts(hourly, STORM_WINDOW_HOURS, threshold,
+                                                               STORM_MIN_HOUR_COUNT, STORM_MIN_BASELINE_HOURS):
+            device_id, type_id = divmod(series, self.max_types)
+            storms.append(("hour", hour, device_id, type_id, count, mean, score))
+        for minute, device_id, count, mean, score in rolling_bursts(self.minute_counts, STORM_WINDOW_MINUTES,
+                                                                    threshold, STORM_MIN_MINUTE_COUNT,
+                                                                    STORM_MIN_BASELINE_MINUTES):
+            storms.append(("minute", minute, device_id, None, count, mean, score))
+        return storms
+
+def rolling_bursts(counts, window, threshold, min_count, min_samples=None):
+    """
+    向量化的滾動 z-score：counts 為 (時間區間, 序列) 陣列，每個區間與前 window 個區間的平均 / 標準差比較
+    (標準差至少以 1 計算，避免平穩序列出現極大值)；前面不足 min_samples (預設 window) 個區間時不計算。
+    只計算有資料的序列，且每次處理 STORM_SERIES_CHUNK 條，
+    暫存陣列大小固定。回傳 z-score 與數量皆超過門檻的 [(區間, 序列, 數量, 基準平均, z-score)]。
+    """
+    active = numpy.flatnonzero(counts.any(axis=0))
+    buckets = numpy.arange(counts.shape[0])
+    lower = numpy.maximum(buckets - window, 0)
+    samples = (buckets - lower)[:, None]
+    baseline = samples >= (window if min_samples is None else max(min_samples, 1))
+    hits = []
+    for chunk_start in range(0, len(active), STORM_SERIES_CHUNK):
+        series = active[chunk_start:chunk_start + STORM_SERIES_CHUNK]
+        values = counts[:, series].astype(numpy.float64)
+        totals = numpy.zeros((len(values) + 1, len(series)))
+        squares = numpy.zeros((len(values) + 1, len(series)))
+        numpy.cumsum(values, axis=0, out=totals[1:])
+        numpy.cumsum(values * values, axis=0, out=squares[1:])
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            mean = numpy.where(samples > 0, (totals[buckets] - totals[lower]) / samples, 0.0)
+            variance = numpy.where(samples > 0, (squares[buckets] - squares[lower]) / samples - mean * mean, 0.0)
+        scores = (values - mean) / numpy.maximum(numpy.sqrt(numpy.maximum(variance, 0.0)), 1.0)
+        for bucket, column in zip(*numpy.nonzero((scores >= threshold) & (values >= min_count) & baseline)):
+            hits.append((int(bucket), int(series[column]), int(values[bucket, column]),
+                         float(mean[bucket, column]), float(scores[bucket, column])))
+    return hits
+
+@metered
 def output_severity_count(out_folder, month_suffix, severity_counts):
     severity_count_list = []
     for syslog_type, data in severity_counts.items():
@@ -72,32 +1257,208 @@ def output_severity_count(out_folder, month_suffix, severity_counts):
         for row in severity_count_list_sorted:
             writer.writerow(row)
 
-def output_log_analysis(out_folder, month_suffix, log_rows):
-    # 新增 "Log Type" 欄位
-    new_rows = []
-    for row in log_rows:
-        new_row = row.copy()
-        new_row["Log Type"] = extract_log_type(new_row["Syslog Message"])
-        new_rows.append(new_row)
-    if len(new_rows) > MAX_EXCEL_ROWS:
-        chunks = [new_rows[i:i+MAX_EXCEL_ROWS] for i in range(0, len(new_rows), MAX_EXCEL_ROWS)]
-        for i, chunk in enumerate(chunks, start=1):
-            filename = os.path.join(out_folder, f"logAnalysis_{month_suffix}_part{i}.csv")
-            with open(filename, "w", newline="", encoding="utf-8") as csvfile:
-                fieldnames = ["Severity", "Device IP", "Hostname", "Log Type", "Syslog Message"]
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                for row in chunk:
-                    writer.writerow(row)
+LOG_ANALYSIS_FIELDS = ["Severity", "Device IP", "Hostname", "Log Type", "Syslog Message"]
+
+class RollingCsvWriter:
+    """
+    串流寫出 {prefix}_{month_suffix}.csv，列數超過 max_rows 時自動換檔：
+    先把目前的檔案改名為 _part1，之後依序寫入 _part2、_part3…，
+    結果與先收集全部資料再分割輸出相同 (未超過上限時只有單一檔案)。
+    """
+    def __init__(self, out_folder, prefix, month_suffix, fieldnames, max_rows=None):
+        self.out_folder = out_folder
+        self.prefix = prefix
+        self.month_suffix = month_suffix
+        self.fieldnames = fieldnames
+        self.max_rows = max_rows if max_rows is not None else MAX_EXCEL_ROWS
+        self.part = 0
+        self.rows_in_part = 0
+        self.csvfile = None
+        self.writer = None
+        self._open(os.path.join(out_folder, f"{prefix}_{month_suffix}.csv"))
+
+    def _part_filename(self, part):
+        return os.path.join(self.out_folder, f"{self.prefix}_{self.month_suffix}_part{part}.csv")
+
+    def _open(self, filename):
+        self.csvfile = open(filename, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.csvfile)
+        self.writer.writerow(self.fieldnames)
+        self.rows_in_part = 0
+
+    def writerow(self, row):
+        if self.rows_in_part >= self.max_rows:
+            self.csvfile.close()
+            if self.part == 0:
+                os.replace(os.path.join(self.out_folder, f"{self.prefix}_{self.month_suffix}.csv"),
+                           self._part_filename(1))
+                self.part = 1
+            self.part += 1
+            self._open(self._part_filename(self.part))
+        self.writer.writerow(row)
+        self.rows_in_part += 1
+
+    def close(self):
+        if self.csvfile is not None:
+            self.csvfile.close()
+            self.csvfile = None
+
+def log_analysis_row(record):
+    return [record.severity, record.device_ip, record.hostname, record.log_type, record.message]
+
+def add_simple_row(simple_dict, record):
+    """
+    logAnalysis_simple 的去重統計：以 (Device IP, 日期, syslog type) 為鍵，保留第一筆並累計次數。
+    """
+    key = (record.device_ip, record.day, record.syslog_type)
+    entry = simple_dict.get(key)
+    if entry is None:
+        simple_dict[key] = [record, 1]
     else:
-        filename = os.path.join(out_folder, f"logAnalysis_{month_suffix}.csv")
-        with open(filename, "w", newline="", encoding="utf-8") as csvfile:
-            fieldnames = ["Severity", "Device IP", "Hostname", "Log Type", "Syslog Message"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for row in new_rows:
-                writer.writerow(row)
+        entry[1] += 1
 
+def add_pie_row(pie_data, record):
+    """
+    圓餅圖統計：{ log_type: { hostname: count } }。
+    """
+    device_counts = pie_data.get(record.log_type)
+    if device_counts is None:
+        device_counts = pie_data[record.log_type] = {}
+    device_counts[record.hostname] = device_counts.get(record.hostname, 0) + 1
+
+class TemplateCluster:
+    """
+    一個訊息範本：tokens 中不固定的位置為 <*>，並累計次數、影響的設備與最早 / 最晚出現時間。
+    """
+    __slots__ = ("template_id", "syslog_type", "severity", "tokens", "count", "devices", "first_key", "first_seen",
+                 "last_key", "last_seen", "example")
+
+    def __init__(self, template_id, record, tokens):
+        self.template_id = template_id
+        self.syslog_type = record.syslog_type
+        self.severity = record.severity
+        self.tokens = tokens
+        self.count = 0
+        self.devices = set()
+        self.first_key = self.last_key = None
+        self.first_seen = self.last_seen = None
+        self.example = record.message
+
+    def similarity(self, tokens):
+        """
+        Drain 的相似度：相同 token 的比例 (<*> 不計)，同分時以 <*> 數量較多者優先。
+        """
+        same = parameters = 0
+        for template_token, token in zip(self.tokens, tokens):
+            if template_token == TEMPLATE_PARAMETER:
+                parameters += 1
+            elif template_token == token:
+                same += 1
+        return (same / len(tokens) if tokens else 1.0), parameters
+
+    def merge(self, tokens):
+        self.tokens = [template_token if template_token == token else TEMPLATE_PARAMETER
+                       for template_token, token in zip(self.tokens, tokens)]
+
+class TemplateMiner:
+    """
+    串流式 Drain 範本歸納：Sev0-3 訊息 (syslog type 之後的內容) 遮罩數字 token 後，
+    依 syslog type → token 數 → 前幾個 token 走固定深度的前綴樹，在葉節點中找最相似的範本，
+    相似度未達門檻時建立新範本。遮罩後內容相同的訊息直接由快取取得範本，不需再走前綴樹；
+    數字換成 0 後 (bytes.translate) 形狀相同的訊息再由第二層快取取得範本，連遮罩的正規表示式都不用執行。
+    """
+    def __init__(self, depth=TEMPLATE_DEPTH, similarity=TEMPLATE_SIMILARITY, max_children=TEMPLATE_MAX_CHILDREN):
+        self.prefix_tokens = max(depth - 2, 0)
+        self.threshold = similarity
+        self.max_children = max_children
+        self.root = {}
+        self.clusters = []
+        self.cache = {}
+        self.shape_cache = {}
+
+    def add(self, record):
+        syslog_type = record.syslog_type
+        message = record.message
+        position = message.rfind(syslog_type + ":")
+        text = message[position + len(syslog_type) + 1:] if position >= 0 else message
+        shape = (syslog_type, text.encode("utf-8", "surrogateescape").translate(TEMPLATE_SHAPE_TABLE))
+        cluster = self.shape_cache.get(shape)
+        if cluster is None:
+            masked = TEMPLATE_MASK_PATTERN.sub(TEMPLATE_PARAMETER, text)
+            key = (syslog_type, masked)
+            cluster = self.cache.get(key)
+            if cluster is None:
+                cluster = self._match(record, masked.split())
+                if len(self.cache) < TEMPLATE_CACHE_LIMIT:
+                    self.cache[key] = cluster
+            # 只有遮罩後的內容已固定對應到這個範本時，形狀快取才與逐筆計算的結果相同
+            if len(self.shape_cache) < TEMPLATE_CACHE_LIMIT and self.cache.get(key) is cluster:
+                self.shape_cache[shape] = cluster
+        cluster.count += 1
+        cluster.devices.add(record.device_ip)
+        # 日期補成兩位數後可直接以字串比較先後 (同一月份)
+        day = record.day
+        time_key = day[4:].rjust(2) + record.time
+        if cluster.first_key is None or time_key < cluster.first_key:
+            cluster.first_key = time_key
+            cluster.first_seen = f"{day} {record.time}"
+        if cluster.last_key is None or time_key > cluster.last_key:
+            cluster.last_key = time_key
+            cluster.last_seen = f"{day} {record.time}"
+
+    def _match(self, record, tokens):
+        node = self.root.setdefault(record.syslog_type, {}).setdefault(len(tokens), {})
+        for token in tokens[:self.prefix_tokens]:
+            child = node.get(token)
+            if child is None:
+                if len(node) >= self.max_children:
+                    token = TEMPLATE_PARAMETER
+                child = node.setdefault(token, {})
+            node = child
+        clusters = node.setdefault(None, [])
+        best = None
+        best_score = None
+        for cluster in clusters:
+            score = cluster.similarity(tokens)
+            if best_score is None or score > best_score:
+                best, best_score = cluster, score
+        if best is not None and best_score[0] >= self.threshold:
+            best.merge(tokens)
+            return best
+        cluster = TemplateCluster(len(self.clusters) + 1, record, tokens)
+        clusters.append(cluster)
+        self.clusters.append(cluster)
+        return cluster
+
+class DetailSink:
+    """
+    最新月份單一類別的 Sev0-3 明細串流輸出：
+    每筆 SyslogRecord 直接寫入 logAnalysis CSV，並同時更新 logAnalysis_simple 與圓餅圖所需的統計，
+    不需保留完整明細列表。templates=True 時另外以 TemplateMiner 歸納訊息範本；
+    write_rows=False 時不輸出 logAnalysis CSV (只統計)。
+    """
+    sketch = False
+
+    def __init__(self, out_folder, month_suffix, templates=False, write_rows=True):
+        self.writer = RollingCsvWriter(out_folder, "logAnalysis", month_suffix, LOG_ANALYSIS_FIELDS) \
+            if write_rows else None
+        self.simple_dict = {}
+        self.pie_data = {}
+        self.templates = TemplateMiner() if templates else None
+
+    def add(self, record):
+        if self.writer is not None:
+            self.writer.writerow(log_analysis_row(record))
+        add_simple_row(self.simple_dict, record)
+        add_pie_row(self.pie_data, record)
+        if self.templates is not None:
+            self.templates.add(record)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+@metered
 def output_log_count(out_folder, month_suffix, historical_counts):
     sorted_file_keys = sorted(historical_counts.keys(), key=lambda x: int(x))
     filename = os.path.join(out_folder, f"logCount_{month_suffix}.csv")
@@ -137,119 +1498,447 @@ def output_log_count(out_folder, month_suffix, historical_counts):
             writer.writerow(diff_row)
             writer.writerow(perc_row)
 
-def output_log_analysis_simple(out_folder, month_suffix, log_rows):
-    simple_dict = {}
-    for row in log_rows:
-        message = row["Syslog Message"]
-        tokens = message.split()
-        day = (tokens[0] + " " + tokens[1]) if len(tokens) >= 2 else "Unknown"
-        type_matches = re.findall(r"(%[^:]+):", message)
-        syslog_type = type_matches[-1] if type_matches else "Unknown"
-        key = (row["Device IP"], day, syslog_type)
-        if key not in simple_dict:
-            simple_dict[key] = (row, 1)
+STORM_REPORT_FIELDS = ["Bucket", "Start", "Device IP", "Hostname", "Syslog Type", "Count", "Baseline Mean",
+                       "Z-Score"]
+
+@metered
+def output_storm_report(out_folder, month_suffix, month, histogram, storms, category):
+    # storms 為 StormHistogram.detect() 的結果，只輸出屬於此類別的設備，依 z-score 由高到低排序
+    rows = []
+    for bucket, position, device_id, type_id, count, mean, score in storms:
+        device_ip, hostname, device_category = histogram.devices[device_id]
+        if device_category != category:
+            continue
+        if bucket == "hour":
+            day, hour = divmod(position, 24)
+            minute = 0
         else:
-            existing_row, count = simple_dict[key]
-            simple_dict[key] = (existing_row, count + 1)
-    simple_results = []
-    for key, (row, count) in simple_dict.items():
-        new_row = {
-            "Duplicates": count,
-            "Severity": row["Severity"],
-            "Device IP": row["Device IP"],
-            "Hostname": row["Hostname"],
-            "Log Type": extract_log_type(row["Syslog Message"]),
-            "Syslog Message": row["Syslog Message"]
-        }
-        simple_results.append(new_row)
+            day, minute = divmod(position, 1440)
+            hour, minute = divmod(minute, 60)
+        rows.append([bucket, f"{month[:4]}-{month[4:]}-{day + 1:02d} {hour:02d}:{minute:02d}", device_ip, hostname,
+                     "(all)" if type_id is None else histogram.types[type_id], count, f"{mean:.2f}", f"{score:.2f}"])
+    rows.sort(key=lambda row: float(row[7]), reverse=True)
+    filename = os.path.join(out_folder, f"stormReport_{month_suffix}.csv")
+    with open(filename, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(STORM_REPORT_FIELDS)
+        writer.writerows(rows)
+
+SKETCH_TYPES_FIELDS = ["Syslog Type", "Severity", "Estimated Count", "Guaranteed Count", "Distinct Devices"]
+
+@metered
+def output_sketch_types(out_folder, month_suffix, rows):
+    # rows 由 SketchDetailSink.type_summary() 產生，已依估計次數排序
+    filename = os.path.join(out_folder, f"sketchTypes_{month_suffix}.csv")
+    with open(filename, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(SKETCH_TYPES_FIELDS)
+        writer.writerows(rows)
+
+LOG_TEMPLATES_FIELDS = ["Template ID", "Syslog Type", "Severity", "Count", "Devices", "First Seen", "Last Seen",
+                        "Template", "Example Message"]
+
+@metered
+def output_log_templates(out_folder, month_suffix, miner):
+    # miner 為 TemplateMiner，依次數由多到少輸出每個範本
+    filename = os.path.join(out_folder, f"logTemplates_{month_suffix}.csv")
+    with open(filename, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(LOG_TEMPLATES_FIELDS)
+        for cluster in sorted(miner.clusters, key=lambda cluster: cluster.count, reverse=True):
+            writer.writerow([cluster.template_id, cluster.syslog_type, cluster.severity, cluster.count,
+                             len(cluster.devices), cluster.first_seen, cluster.last_seen, " ".join(cluster.tokens),
+                             cluster.example])
+
+@metered
+def output_log_analysis_simple(out_folder, month_suffix, simple_dict):
+    # simple_dict 由 add_simple_row 累積：{ (Device IP, day, syslog type): [第一筆 SyslogRecord, 次數] }
     filename = os.path.join(out_folder, f"logAnalysis_simple_{month_suffix}.csv")
     with open(filename, "w", newline="", encoding="utf-8") as csvfile:
-        fieldnames = ["Duplicates", "Severity", "Device IP", "Hostname", "Log Type", "Syslog Message"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in simple_results:
-            writer.writerow(row)
+        writer = csv.writer(csvfile)
+        writer.writerow(["Duplicates", "Severity", "Device IP", "Hostname", "Log Type", "Syslog Message"])
+        for record, count in simple_dict.values():
+            writer.writerow([count, record.severity, record.device_ip, record.hostname, record.log_type,
+                             record.message])
+
+def load_pyplot():
+    """
+    延遲載入 matplotlib 並固定使用不需顯示器的 Agg 後端，只輸出 CSV 時不必負擔載入成本。
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
 
-def output_trend(out_folder, historical_counts):
+def trend_chart_specs(out_folder, historical_counts):
+    """
+    產生兩張歷史趨勢折線圖 (Sev0-3 / Sev4-6) 的繪圖參數，實際繪製由 render_chart 負責。
+    """
     sorted_file_keys = sorted(historical_counts.keys(), key=lambda x: int(x))
     formatted_months = [key[:4] + "-" + key[4:] for key in sorted_file_keys]
     sev0_3_counts = [historical_counts[m]['sev0_3'] for m in sorted_file_keys]
     sev4_6_counts = [historical_counts[m]['sev4_6'] for m in sorted_file_keys]
-    
-    # 產生 Severity 0-3 圖表
-    plt.figure(figsize=(20, 5))
-    plt.plot(formatted_months, sev0_3_counts, marker='o', label="Sev0-3", color='orange')
-    plt.xlabel("Month")
-    plt.ylabel("Log Count")
-    plt.title("Historical Log Count (Sev0-3)")
-    plt.legend()
-    plt.grid(True)
-    trend_file_03 = os.path.join(out_folder, "log_trend_0-3.png")
-    plt.savefig(trend_file_03)
-    plt.close()
-    
-    # 產生 Severity 4-6 圖表
-    plt.figure(figsize=(20, 5))
-    plt.plot(formatted_months, sev4_6_counts, marker='o', label="Sev4-6", color='blue')
-    plt.xlabel("Month")
-    plt.ylabel("Log Count")
-    plt.title("Historical Log Count (Sev4-6)")
-    plt.legend()
-    plt.grid(True)
-    trend_file_46 = os.path.join(out_folder, "log_trend_4-6.png")
-    plt.savefig(trend_file_46)
-    plt.close()
+    return [
+        {"kind": "trend", "months": formatted_months, "counts": sev0_3_counts, "label": "Sev0-3",
+         "color": "orange", "title": "Historical Log Count (Sev0-3)",
+         "filename": os.path.join(out_folder, "log_trend_0-3.png")},
+        {"kind": "trend", "months": formatted_months, "counts": sev4_6_counts, "label": "Sev4-6",
+         "color": "blue", "title": "Historical Log Count (Sev4-6)",
+         "filename": os.path.join(out_folder, "log_trend_4-6.png")},
+    ]
 
-def output_pie_charts(out_folder, log_rows, month_suffix):
+def pie_chart_specs(out_folder, pie_data, month_suffix, top_types=None):
     """
-    根據 logAnalysis 的資料來產生圓餅圖。
-    以 syslog type 分組，每個圓餅圖統計該 type 各設備 (以 Hostname 為主) 的比例，
+    根據 logAnalysis 的資料 (由 add_pie_row 累積的 pie_data) 產生圓餅圖的繪圖參數。
+    以 log type 分組，每個圓餅圖統計該 type 各設備 (以 Hostname 為主) 的比例，
     若超過 5 筆則僅顯示前 5 名，其餘統整為 "Other"。
-    圓餅圖存檔時會移除 log type 中的不合法字元，並正確加上 .png 副檔名，
-    圖中顯示百分比及實際次數。
-    """
-    def make_autopct(values):
-        def my_autopct(pct):
-            total = sum(values)
-            count = int(round(pct*total/100.0))
-            return '{p:.1f}% ({v:d})'.format(p=pct, v=count)
-        return my_autopct
-
-    pie_data = {}
-    for row in log_rows:
-        log_type = extract_log_type(row["Syslog Message"])
-        device = row.get("Hostname", row.get("Device IP", "Unknown"))
-        if log_type not in pie_data:
-            pie_data[log_type] = {}
-        if device not in pie_data[log_type]:
-            pie_data[log_type][device] = 0
-        pie_data[log_type][device] += 1
-
-    for log_type, device_counts in pie_data.items():
+    top_types 指定時只保留筆數最多的前 N 個 log type。
+    圓餅圖存檔時會移除 log type 中的不合法字元，並正確加上 .png 副檔名。
+    """
+    log_types = list(pie_data.keys())
+    if top_types is not None:
+        log_types = sorted(log_types, key=lambda x: sum(pie_data[x].values()), reverse=True)[:top_types]
+
+    specs = []
+    for log_type in log_types:
+        device_counts = pie_data[log_type]
         # 清理 log_type：移除 "%" 與 Windows 不允許的字元
         log_type_clean = re.sub(r'[\\/*?:"<>|%]', '', log_type)
-        sorted_devices = sorted(device_counts.items(), key=lambda x: x[1], reverse=True)
-        if len(sorted_devices) > 5:
+        # 近似模式 (SketchDetailSink) 以 None 鍵提供前 5 名以外的合計
+        remainder = device_counts.get(None, 0)
+        sorted_devices = sorted(((device, count) for device, count in device_counts.items() if device is not None),
+                                key=lambda x: x[1], reverse=True)
+        if len(sorted_devices) > 5 or remainder:
             top_devices = sorted_devices[:5]
-            others_total = sum(count for device, count in sorted_devices[5:])
+            others_total = sum(count for device, count in sorted_devices[5:]) + remainder
             top_devices.append(("Other", others_total))
         else:
             top_devices = sorted_devices
-        labels = [device for device, count in top_devices]
-        sizes = [count for device, count in top_devices]
+        specs.append({
+            "kind": "pie",
+            "labels": [device for device, count in top_devices],
+            "sizes": [count for device, count in top_devices],
+            "title": f"{log_type_clean} ({month_suffix})",
+            "filename": os.path.join(out_folder, f"{log_type_clean}_pie_{month_suffix}.png"),
+        })
+    return specs
+
+def make_autopct(values):
+    def my_autopct(pct):
+        total = sum(values)
+        count = int(round(pct*total/100.0))
+        return '{p:.1f}% ({v:d})'.format(p=pct, v=count)
+    return my_autopct
+
+def render_chart(spec):
+    """
+    依繪圖參數繪製並存檔單張圖表，可在子行程中執行。
+    """
+    plt = load_pyplot()
+    if spec["kind"] == "trend":
+        plt.figure(figsize=(20, 5))
+        plt.plot(spec["months"], spec["counts"], marker='o', label=spec["label"], color=spec["color"])
+        plt.xlabel("Month")
+        plt.ylabel("Log Count")
+        plt.title(spec["title"])
+        plt.legend()
+        plt.grid(True)
+    else:
+        # 圖中顯示百分比及實際次數
         plt.figure(figsize=(8, 8))
-        plt.pie(sizes, labels=labels, autopct=make_autopct(sizes), startangle=140)
-        plt.title(f"{log_type_clean} ({month_suffix})")
-        pie_filename = os.path.join(out_folder, f"{log_type_clean}_pie_{month_suffix}.png")
-        plt.savefig(pie_filename)
-        plt.close()
-
-def main():
-    # 掃描目錄下所有符合 YYYYMM.txt 格式的檔案
-    files = [f for f in glob.glob("*.txt") if re.match(r"\d{6}\.txt$", f)]
+        plt.pie(spec["sizes"], labels=spec["labels"], autopct=make_autopct(spec["sizes"]), startangle=140)
+        plt.title(spec["title"])
+    plt.savefig(spec["filename"])
+    plt.close()
+    return spec["filename"]
+
+@metered
+def render_charts(specs, jobs=1):
+    """
+    繪製所有圖表；jobs > 1 時以行程池平行繪製。
+    檔名相同的圖表 (log type 清理後同名) 以最後一張為準，與依序繪製時的覆寫結果一致。
+    """
+    specs = list({spec["filename"]: spec for spec in specs}.values())
+    if jobs > 1 and len(specs) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(specs))) as executor:
+            list(tqdm(executor.map(render_chart, specs, chunksize=4), total=len(specs), desc="Rendering charts"))
+    else:
+        for spec in tqdm(specs, desc="Rendering charts"):
+            render_chart(spec)
+
+def file_head_signature(file, length=FOLLOW_HEAD_BYTES):
+    """
+    取檔案開頭最多 length 位元組的雜湊，用來判斷檔案是否被替換或改寫。
+    """
+    with open(file, "rb") as f:
+        head = f.read(length)
+    return len(head), hashlib.sha256(head).hexdigest()
+
+def complete_lines_end(file, start, end):
+    """
+    回傳 [start, end) 範圍內最後一個換行字元之後的位置，尚未寫完的最後一行留待下一次處理。
+    """
+    position = end
+    with open(file, "rb") as f:
+        while position > start:
+            block_start = max(start, position - READ_BUFFER_BYTES)
+            f.seek(block_start)
+            block = f.read(position - block_start)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                return block_start + newline + 1
+            position = block_start
+    return start
+
+def load_follow_checkpoint(checkpoint_file):
+    if not os.path.exists(checkpoint_file):
+        return None
+    with open(checkpoint_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_follow_checkpoint(checkpoint_file, checkpoint):
+    # 先寫入暫存檔再取代，避免中斷時留下不完整的檢查點
+    tmp_file = checkpoint_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_file, checkpoint_file)
+
+def new_follow_checkpoint(file, device_version, categories):
+    result = new_ingest_result(categories)
+    return {
+        "file": os.path.abspath(file),
+        "inode": None,
+        "offset": 0,
+        "head_length": 0,
+        "head_hash": None,
+        "device_version": device_version,
+        "counts": {category: result[category]["counts"] for category in categories},
+        "severity": {category: result[category]["severity"] for category in categories},
+    }
+
+def follow_tick(file, index, checkpoint):
+    """
+    追蹤模式的一次更新：只解析檢查點 offset 之後新增的完整行，並累加到檢查點中的
+    latest_count (counts) 與 severity_latest (severity)。每次的成本只與新增資料量成正比。
+    檔案變動的處理：
+      - inode 改變或檔案變短，且檔頭與上次相同：視為同一份 log 被重新匯出，清空累計後從頭解析
+      - inode 改變或檔案變短 (或檔頭不同)，且檔頭與上次不同：視為 log rotation / 截斷後寫入新內容，
+        已累計的數量保留，新檔案從頭開始解析
+    回傳本次解析的位元組數。
+    """
+    stat = os.stat(file)
+    offset = checkpoint["offset"]
+    head_length = checkpoint["head_length"]
+    same_head = head_length == 0 or file_head_signature(file, head_length) == (head_length, checkpoint["head_hash"])
+    if checkpoint["inode"] is not None and (stat.st_ino != checkpoint["inode"] or stat.st_size < offset
+                                            or not same_head):
+        if same_head and head_length > 0:
+            print(f"{file} was rewritten, re-reading it from the beginning")
+            fresh = new_follow_checkpoint(file, checkpoint["device_version"], list(checkpoint["counts"]))
+            checkpoint["counts"] = fresh["counts"]
+            checkpoint["severity"] = fresh["severity"]
+        else:
+            print(f"{file} was rotated or truncated, continuing from the start of the new file")
+        offset = 0
+    end = complete_lines_end(file, offset, stat.st_size)
+    if end > offset:
+        part = ingest_file(file, index, detail=True, start=offset, end=end, keep_rows=False,
+                           desc=f"Following {file}")
+        total = new_ingest_result(list(checkpoint["counts"]))
+        for category in total:
+            total[category]["counts"] = checkpoint["counts"][category]
+            total[category]["severity"] = checkpoint["severity"][category]
+        merge_ingest_result(total, part)
+    checkpoint["inode"] = stat.st_ino
+    checkpoint["offset"] = end
+    checkpoint["head_length"], checkpoint["head_hash"] = file_head_signature(file)
+    checkpoint["updated"] = datetime.datetime.now().isoformat(timespec="seconds")
+    return end - offset
+
+@metered
+def output_live_snapshot(out_folders, month, counts, severity):
+    """
+    將目前月份的累計結果 (counts / severity 皆為 {category: ...}) 輸出至 DCN_Syslog_{類別}_live 資料夾，
+    供追蹤模式與網路接收器共用。
+    """
+    for category, out_folder in out_folders.items():
+        os.makedirs(out_folder, exist_ok=True)
+        output_severity_count(out_folder, month[-2:], severity[category])
+        output_log_count(out_folder, month[-2:], {month: counts[category]})
+
+def live_out_folders(categories):
+    return {category: f"DCN_Syslog_{category}_live" for category in categories}
+
+def run_follow(args):
+    """
+    追蹤目前月份 (最新的未壓縮 YYYYMM.txt)：每個週期只解析新增的資料，
+    並將累計結果輸出至固定的 DCN_Syslog_{類別}_live 資料夾 (severityCount / logCount)。
+    檢查點存於 dcnSyslogFollow_{YYYYMM}.json，下次執行會從上次的位置繼續；出現新月份檔案時自動切換。
+    """
+    index = load_device_list(args.input_dir)
+    device_version = device_list_version(args.input_dir)
+    out_folders = live_out_folders(index.all_categories)
+    reset = args.follow_reset
+    try:
+        while True:
+            files = [f for f in find_input_files(args.input_dir) if not is_compressed(f)]
+            if not files:
+                print("No uncompressed YYYYMM.txt file found to follow.")
+                return
+            file = max(files, key=lambda f: int(month_key(f)))
+            month = month_key(file)
+            checkpoint_file = FOLLOW_CHECKPOINT_FILE.format(month=month)
+            checkpoint = None if reset else load_follow_checkpoint(checkpoint_file)
+            reset = False
+            if checkpoint is None or checkpoint["device_version"] != device_version:
+                checkpoint = new_follow_checkpoint(file, device_version, index.all_categories)
+            new_bytes = follow_tick(file, index, checkpoint)
+            save_follow_checkpoint(checkpoint_file, checkpoint)
+            output_live_snapshot(out_folders, month, checkpoint["counts"], checkpoint["severity"])
+            print(f"[{checkpoint['updated']}] {file}: +{new_bytes} bytes, offset {checkpoint['offset']}")
+            if args.once:
+                return
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\nFollow mode stopped.")
+
+def month_argument(value):
+    if not re.fullmatch(r"\d{6}", value):
+        raise argparse.ArgumentTypeError(f"expected a month as YYYYMM, got {value!r}")
+    return value
+
+def stages_argument(value):
+    unknown = [stage for stage in value.split(",") if stage not in REPORT_STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stages {','.join(unknown)} (choose from {','.join(REPORT_STAGES)})")
+    return value
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DCN syslog analyzer")
+    parser.add_argument("--batch", action="store_true",
+                        help="do not prompt for files: analyze every YYYYMM.txt in --input-dir "
+                             "within --from/--to (implied by --from/--to)")
+    parser.add_argument("--from", dest="month_from", type=month_argument, default=None, metavar="YYYYMM",
+                        help="first month to analyze as YYYYMM (implies --batch)")
+    parser.add_argument("--to", dest="month_to", type=month_argument, default=None, metavar="YYYYMM",
+                        help="last month to analyze as YYYYMM; the latest selected month gets the detailed reports "
+                             "(implies --batch)")
+    parser.add_argument("--input-dir", default=".",
+                        help="directory containing the YYYYMM.txt files and deviceList_v*.csv (default: .)")
+    parser.add_argument("--output-dir", default=None,
+                        help="write to fixed DCN_Syslog_<category> folders under this directory and only "
+                             f"regenerate reports whose inputs changed (tracked in {MANIFEST_FILE})")
+    parser.add_argument("--force", action="store_true",
+                        help="with --output-dir, regenerate every report even if its inputs are unchanged")
+    parser.add_argument("--categories", default=None,
+                        help="comma separated categories to write reports for (default: all)")
+    parser.add_argument("--stages", type=stages_argument, default=",".join(REPORT_STAGES),
+                        help="comma separated reports to produce: severity (severityCount), analysis "
+                             "(logAnalysis, logAnalysis_simple), counts (logCount), trend, pie "
+                             f"(default: {','.join(REPORT_STAGES)})")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="number of worker processes for historical months (default: 1, serial)")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="split the latest month into N newline-aligned byte ranges parsed in parallel "
+                             "(uses --jobs workers, or N workers if --jobs is not set; "
+                             "ignored for compressed files)")
+    parser.add_argument("--no-charts", action="store_true",
+                        help="skip trend and pie chart rendering (CSV output only)")
+    parser.add_argument("--top-types", type=int, default=None,
+                        help="only render pie charts for the N log types with the most sev0-3 rows")
+    parser.add_argument("--chart-jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes for chart rendering (default: CPU count)")
+    parser.add_argument("--export-db", default=None,
+                        help="export every parsed record of the latest month to an indexed SQLite database "
+                             "(or a directory of YYYYMM.parquet files with --export-format parquet)")
+    parser.add_argument("--export-format", choices=["sqlite", "parquet"], default="sqlite",
+                        help="format for --export-db (default: sqlite)")
+    parser.add_argument("--export-history", action="store_true",
+                        help="with --export-db, also re-parse and export the selected historical months")
+    parser.add_argument("--templates", action="store_true",
+                        help="group the latest month's sev0-3 messages into templates (Drain) and write "
+                             "logTemplates_MM.csv")
+    parser.add_argument("--storm", action="store_true",
+                        help="count the latest month per hour/minute, device and syslog type and write "
+                             "stormReport_MM.csv with bursts found by a rolling z-score (requires numpy)")
+    parser.add_argument("--storm-threshold", type=float, default=STORM_Z_THRESHOLD,
+                        help=f"z-score that marks a burst (default: {STORM_Z_THRESHOLD})")
+    parser.add_argument("--storm-devices", type=int, default=STORM_MAX_DEVICES,
+                        help="devices tracked individually before the rest are grouped as (other) "
+                             f"(default: {STORM_MAX_DEVICES})")
+    parser.add_argument("--storm-types", type=int, default=STORM_MAX_TYPES,
+                        help="syslog types tracked individually before the rest are grouped as (other) "
+                             f"(default: {STORM_MAX_TYPES})")
+    parser.add_argument("--sketch", action="store_true",
+                        help="bounded-memory approximate mode: severityCount, logAnalysis_simple and pie charts "
+                             "come from Space-Saving / Count-Min / HyperLogLog sketches, plus sketchTypes_MM.csv")
+    parser.add_argument("--sketch-epsilon", type=float, default=SKETCH_EPSILON,
+                        help="with --sketch, count overestimate bound as a fraction of all rows; also tracks "
+                             f"1/epsilon syslog types and simple groups (default: {SKETCH_EPSILON})")
+    parser.add_argument("--sketch-delta", type=float, default=SKETCH_DELTA,
+                        help=f"with --sketch, probability of exceeding the Count-Min bound (default: {SKETCH_DELTA})")
+    parser.add_argument("--sketch-hll-error", type=float, default=SKETCH_HLL_ERROR,
+                        help="with --sketch, relative standard error of distinct device counts "
+                             f"(default: {SKETCH_HLL_ERROR})")
+    parser.add_argument("--sketch-devices", type=int, default=SKETCH_DEVICES_PER_TYPE,
+                        help="with --sketch, devices tracked per log type for the pie charts "
+                             f"(default: {SKETCH_DEVICES_PER_TYPE})")
+    parser.add_argument("--profile", action="store_true",
+                        help="run the analysis under cProfile and write runProfile.txt / runProfile.prof "
+                             "to each output folder (worker processes are not profiled)")
+    parser.add_argument("--follow", action="store_true",
+                        help="follow the current month's YYYYMM.txt, parsing only newly appended bytes on each tick")
+    parser.add_argument("--interval", type=float, default=60,
+                        help="seconds between follow ticks (default: 60)")
+    parser.add_argument("--once", action="store_true",
+                        help="with --follow, run a single tick and exit (for cron)")
+    parser.add_argument("--follow-reset", action="store_true",
+                        help="with --follow, discard the saved checkpoint and re-read the current month")
+    parser.add_argument("--cache-file", default=CACHE_FILE,
+                        help=f"per-month aggregate cache database (default: {CACHE_FILE})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not read or write the per-month aggregate cache")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="discard all cached months and rebuild the cache from this run")
+    parser.add_argument("--cache-hash", action="store_true",
+                        help="also require a matching SHA-256 of the file content for cache hits")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.follow:
+        run_follow(args)
+        return
+    # 掃描目錄下所有符合 YYYYMM.txt 格式的檔案 (含壓縮封存)
+    files = find_input_files(args.input_dir)
     if not files:
-        print("No valid txt files found in the format YYYYMM.txt.")
+        print("No valid txt files found in the format YYYYMM.txt (optionally .gz/.bz2/.xz/.zst).")
         return
+    if args.batch or args.month_from or args.month_to:
+        # 非互動模式：依 --from / --to 選取月份 (未指定時為全部)，適合排程執行
+        selected_files = [file for file in files
+                          if (not args.month_from or month_key(file) >= args.month_from)
+                          and (not args.month_to or month_key(file) <= args.month_to)]
+        if not selected_files:
+            print("No input files in the selected month range.")
+            return
+        print(f"Selected {len(selected_files)} files: {', '.join(sorted(map(month_key, selected_files)))}")
+    else:
+        selected_files = select_files_interactive(files)
+        if not selected_files:
+            return
+    if args.profile:
+        # --profile：以 cProfile 包住整個分析 (行程池的子行程不在統計內)，熱點摘要寫入每個輸出資料夾
+        profiler = cProfile.Profile()
+        out_folders = profiler.runcall(run_analysis, args, selected_files, argv)
+        output_profile(profiler, out_folders.values())
+    else:
+        run_analysis(args, selected_files, argv)
+
+def select_files_interactive(files):
+    """
+    列出檔案並詢問要分析哪些，回傳選取的檔案；取消或輸入無效時回傳 None。
+    """
     print("Found the following files:")
     for idx, file in enumerate(files, start=1):
         print(f"{idx}. {file}")
@@ -258,241 +1947,338 @@ def main():
         confirm = input("No numbers entered. Do you want to analyze all files? (y/n): ").strip().lower()
         if confirm not in ["y", "yes", ""]:
             print("Analysis canceled.")
-            return
+            return None
         indices = list(range(1, len(files) + 1))
     else:
         try:
             indices = [int(x.strip()) for x in selection.split(",") if x.strip().isdigit()]
         except Exception:
             print("Invalid input format.")
-            return
+            return None
     selected_files = [files[i - 1] for i in indices if 1 <= i <= len(files)]
     if not selected_files:
         print("No valid files selected.")
-        return
-    sorted_files = sorted(selected_files, key=lambda f: int(os.path.splitext(f)[0]))
+        return None
+    return selected_files
+
+def select_categories(categories, requested):
+    """
+    --categories 指定時只保留其中的類別 (不分大小寫，依設備清單順序)，不存在的類別只顯示警告。
+    """
+    if not requested:
+        return categories
+    wanted = [name.strip().upper() for name in requested.split(",") if name.strip()]
+    for name in wanted:
+        if name not in categories:
+            print(f"Category {name} is not in the device list, skipping it.")
+    return [category for category in categories if category in wanted]
+
+def detail_options(args):
+    # 影響最新月份明細報表內容的選項，任一變動都會重新產生
+    return {"sketch": [args.sketch_epsilon, args.sketch_delta, args.sketch_hll_error, args.sketch_devices]
+            if args.sketch else None,
+            "storm": [args.storm_threshold, args.storm_devices, args.storm_types] if args.storm else None,
+            "templates": args.templates, "top_types": args.top_types, "max_rows": MAX_EXCEL_ROWS}
+
+def load_manifest(output_dir):
+    manifest_file = os.path.join(output_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_file):
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    return {"version": MANIFEST_VERSION, "units": {}}
+
+def save_manifest(output_dir, manifest):
+    # 先寫入暫存檔再取代，避免中斷時留下不完整的 manifest
+    manifest_file = os.path.join(output_dir, MANIFEST_FILE)
+    with open(manifest_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(manifest_file + ".tmp", manifest_file)
+
+def manifest_unit_fresh(manifest, output_dir, unit, inputs):
+    """
+    報表組 unit 的輸入與上次產生時相同，且當時的輸出檔都還在時回傳 True。
+    """
+    entry = manifest["units"].get(unit)
+    return (entry is not None and entry["inputs"] == inputs
+            and all(os.path.exists(os.path.join(output_dir, path)) for path in entry["outputs"]))
+
+def unit_slot(unit):
+    """
+    報表組寫入的檔名只含月份 MM (例如 logCount_03.csv)，不同年份的同一月份會寫到相同檔案：
+    "detail:TFN:202403" 與 "detail:TFN:202503" 同為 "detail:TFN:03"。
+    """
+    return re.sub(r"\d{4}(\d\d)$", r"\1", unit)
+
+def remove_unit_outputs(manifest, output_dir, unit):
+    # 重新產生前先刪除上次的輸出，避免留下已不存在的 log type 圓餅圖或多餘的 _partN 檔；
+    # 寫入相同檔名的其他年份報表組也一併移除，之後改產生該年份時才會重新輸出
+    for other in [name for name in manifest["units"] if unit_slot(name) == unit_slot(unit)]:
+        for path in manifest["units"].pop(other)["outputs"]:
+            if os.path.exists(os.path.join(output_dir, path)):
+                os.remove(os.path.join(output_dir, path))
+
+def record_unit_outputs(manifest, output_dir, unit, inputs, paths):
+    outputs = sorted(os.path.relpath(path, output_dir) for path in paths)
+    # 其他報表組記錄的檔案若已被這次的輸出覆寫，該報表組不再有效
+    for other in [name for name, entry in manifest["units"].items()
+                  if name != unit and not set(outputs).isdisjoint(entry["outputs"])]:
+        del manifest["units"][other]
+    manifest["units"][unit] = {"inputs": inputs, "outputs": outputs,
+                               "updated": datetime.datetime.now().isoformat(timespec="seconds")}
+
+def is_detail_output(name, month_suffix):
+    """
+    最新月份明細報表的檔名：*_{MM}.csv / *_{MM}.png / *_{MM}_partN.csv，但不含歷史統計的 logCount。
+    """
+    return (re.search(rf"_{month_suffix}(_part\d+)?\.(csv|png)$", name) is not None
+            and not name.startswith("logCount_"))
+
+def output_profile(profiler, out_folders):
+    """
+    將 cProfile 結果依累計時間與自身時間排序，各列出前 PROFILE_TOP 個函式，
+    寫入每個輸出資料夾的 runProfile.txt (原始資料另存為 runProfile.prof) 並顯示累計時間的部分。
+    """
+    summaries = {}
+    for sort_key in ("cumulative", "tottime"):
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).strip_dirs().sort_stats(sort_key).print_stats(PROFILE_TOP)
+        summaries[sort_key] = stream.getvalue()
+    for out_folder in out_folders:
+        profiler.dump_stats(os.path.join(out_folder, PROFILE_DATA_FILE))
+        with open(os.path.join(out_folder, PROFILE_SUMMARY_FILE), "w", encoding="utf-8") as f:
+            for sort_key, summary in summaries.items():
+                f.write(f"===== sorted by {sort_key} =====\n{summary}\n")
+    print(summaries["cumulative"])
+
+def run_analysis(args, selected_files, argv=None):
+    """
+    分析選取的檔案並輸出每個類別的資料夾，回傳 {category: 輸出資料夾}。
+    各階段的時間、讀取量與記憶體峰值寫入每個資料夾的 runMetrics.json。
+    """
+    global _run_metrics
+    metrics = _run_metrics = RunMetrics(argv)
+    try:
+        return analyze_files(args, selected_files, metrics)
+    finally:
+        _run_metrics = None
+
+def analyze_files(args, selected_files, metrics):
+    sorted_files = sorted(selected_files, key=lambda f: int(month_key(f)))
     latest_file = sorted_files[-1]
-    latest_month = os.path.splitext(latest_file)[0]
+    latest_month = month_key(latest_file)
     month_suffix = latest_month[-2:]
     print(f"Latest file for CSV analysis: {latest_file}")
-    # 載入 deviceList.csv (格式: Type,Hostname,IP)
-    mapping_tfn, mapping_twm = load_device_list()
-    # ① 歷史資料統計（用於折線圖）：分別統計 TFN、TWM 與 UNKNOWN
-    historical_counts_tfn = {}
-    historical_counts_twm = {}
-    historical_counts_unknown = {}
-    for file in selected_files:
-        file_key = os.path.splitext(file)[0]
-        historical_counts_tfn[file_key] = {'sev0_3': 0, 'sev4_6': 0, 'total': 0}
-        historical_counts_twm[file_key] = {'sev0_3': 0, 'sev4_6': 0, 'total': 0}
-        historical_counts_unknown[file_key] = {'sev0_3': 0, 'sev4_6': 0, 'total': 0}
-        with open(file, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        for line in tqdm(lines, desc=f"Historical Processing {file}"):
-            line = line.strip()
-            if not line:
-                continue
-            sev_match = re.search(r"%\S+-(\d)-\S+:", line)
-            if not sev_match:
-                continue
-            try:
-                severity = int(sev_match.group(1))
-            except Exception:
-                continue
-            tokens = line.split()
-            if len(tokens) < 4:
+    # 載入 deviceList.csv (格式: Type,Hostname,IP)，每個類別各自輸出一個資料夾 (--categories 可只輸出部分類別)
+    with metrics.stage("load_device_list"):
+        index = load_device_list(args.input_dir)
+    categories = select_categories(index.all_categories, args.categories)
+    if not categories:
+        print("None of the requested categories exist.")
+        return {}
+    stages = set(args.stages.split(","))
+    if args.no_charts:
+        stages -= {"trend", "pie"}
+    # --output-dir：固定的輸出資料夾，依 manifest 只重新產生輸入有變動的報表；否則每次建立新的時間戳記資料夾
+    if args.output_dir:
+        out_folders = {category: os.path.join(args.output_dir, f"DCN_Syslog_{category}") for category in categories}
+    else:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        out_folders = {category: f"DCN_Syslog_{category}_{timestamp}" for category in categories}
+    for out_folder in out_folders.values():
+        os.makedirs(out_folder, exist_ok=True)
+    unique_files = list(dict.fromkeys(selected_files))
+    file_counts = {}
+    # 已結束的月份內容不會變動：先查每月統計快取，只有快取失效或不存在的月份才重新解析
+    cache = None if args.no_cache else open_count_cache(args.cache_file, args.rebuild_cache)
+    device_version = device_list_version(args.input_dir)
+    manifest = load_manifest(args.output_dir) if args.output_dir else None
+    fingerprints = {}
+    if cache is not None or manifest is not None:
+        fingerprints = {file: file_fingerprint(file, args.cache_hash) for file in unique_files}
+    # 解析結果匯出：預設只匯出最新月份，--export-history 時歷史月份也重新完整解析並匯出 (不使用快取)
+    exporter = open_record_exporter(args.export_db, args.export_format,
+                                    args.export_history and len(unique_files) > 1) if args.export_db else None
+    export_history = exporter is not None and args.export_history
+    # 每個類別的報表分成三組：最新月份的明細報表 (severityCount、logAnalysis、圓餅圖…)、logCount 與趨勢圖，
+    # 各自的輸入 (檔案指紋、設備清單、選項) 與上次相同且輸出檔仍存在時直接沿用；
+    # 趨勢圖檔名不含月份，所以不分月份只記錄最後一次產生時的輸入
+    detail_inputs = {"file": fingerprints.get(latest_file), "device_version": device_version,
+                     "stages": sorted(stages & DETAIL_STAGES), "options": detail_options(args)}
+    counts_inputs = {"months": {month_key(file): fingerprints.get(file) for file in unique_files},
+                     "device_version": device_version}
+    units = {"detail": (lambda category: f"detail:{category}:{latest_month}", detail_inputs),
+             "counts": (lambda category: f"counts:{category}:{latest_month}", counts_inputs),
+             "trend": (lambda category: f"trend:{category}", counts_inputs)}
+    wanted = {"detail": bool(stages & DETAIL_STAGES) or args.storm or args.templates,
+              "counts": "counts" in stages, "trend": "trend" in stages}
+    rebuild = {group: list(categories) if wanted[group] else [] for group in units}
+    if manifest is not None:
+        for group, (unit_name, inputs) in units.items():
+            # --force 或匯出 (需要重新解析最新月份，明細報表也一併重新產生) 時不檢查
+            if args.force or (group == "detail" and exporter is not None):
                 continue
-            device_ip = tokens[3]
-            if device_ip in mapping_tfn:
-                category = "TFN"
-            elif device_ip in mapping_twm:
-                category = "TWM"
-            else:
-                category = "UNKNOWN"
-            if category == "TFN":
-                if 0 <= severity <= 3:
-                    historical_counts_tfn[file_key]['sev0_3'] += 1
-                elif 4 <= severity <= 6:
-                    historical_counts_tfn[file_key]['sev4_6'] += 1
-                historical_counts_tfn[file_key]['total'] += 1
-            elif category == "TWM":
-                if 0 <= severity <= 3:
-                    historical_counts_twm[file_key]['sev0_3'] += 1
-                elif 4 <= severity <= 6:
-                    historical_counts_twm[file_key]['sev4_6'] += 1
-                historical_counts_twm[file_key]['total'] += 1
-            else:
-                if 0 <= severity <= 3:
-                    historical_counts_unknown[file_key]['sev0_3'] += 1
-                elif 4 <= severity <= 6:
-                    historical_counts_unknown[file_key]['sev4_6'] += 1
-                historical_counts_unknown[file_key]['total'] += 1
-    # ② 最新月份資料分析（僅處理最新檔案），分別對 TFN、TWM 與 UNKNOWN
-    severity_latest_tfn = {}
-    log_analysis_latest_tfn = []
-    latest_count_tfn = {'sev0_3': 0, 'sev4_6': 0, 'total': 0}
-    
-    severity_latest_twm = {}
-    log_analysis_latest_twm = []
-    latest_count_twm = {'sev0_3': 0, 'sev4_6': 0, 'total': 0}
-    
-    severity_latest_unknown = {}
-    log_analysis_latest_unknown = []
-    latest_count_unknown = {'sev0_3': 0, 'sev4_6': 0, 'total': 0}
-    
-    with open(latest_file, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    for line in tqdm(lines, desc=f"Processing Latest File {latest_file}"):
-        line = line.strip()
-        if not line:
-            continue
-        sev_match = re.search(r"%\S+-(\d)-\S+:", line)
-        if not sev_match:
-            continue
-        try:
-            severity = int(sev_match.group(1))
-        except Exception:
-            continue
-        tokens = line.split()
-        if len(tokens) < 4:
-            continue
-        device_ip = tokens[3]
-        if device_ip in mapping_tfn:
-            category = "TFN"
-        elif device_ip in mapping_twm:
-            category = "TWM"
-        else:
-            category = "UNKNOWN"
-        if category == "TFN":
-            if 0 <= severity <= 6:
-                type_matches = re.findall(r"(%[^:]+):", line)
-                syslog_type = type_matches[-1] if type_matches else "Unknown"
-                if syslog_type not in severity_latest_tfn:
-                    severity_latest_tfn[syslog_type] = {'severity': severity, 'count': 0}
-                severity_latest_tfn[syslog_type]['count'] += 1
-            if 0 <= severity <= 3:
-                latest_count_tfn['sev0_3'] += 1
-                log_analysis_latest_tfn.append({
-                    "Severity": severity,
-                    "Device IP": device_ip,
-                    "Syslog Message": line
-                })
-            elif 4 <= severity <= 6:
-                latest_count_tfn['sev4_6'] += 1
-            latest_count_tfn['total'] += 1
-        elif category == "TWM":
-            if 0 <= severity <= 6:
-                type_matches = re.findall(r"(%[^:]+):", line)
-                syslog_type = type_matches[-1] if type_matches else "Unknown"
-                if syslog_type not in severity_latest_twm:
-                    severity_latest_twm[syslog_type] = {'severity': severity, 'count': 0}
-                severity_latest_twm[syslog_type]['count'] += 1
-            if 0 <= severity <= 3:
-                latest_count_twm['sev0_3'] += 1
-                log_analysis_latest_twm.append({
-                    "Severity": severity,
-                    "Device IP": device_ip,
-                    "Syslog Message": line
-                })
-            elif 4 <= severity <= 6:
-                latest_count_twm['sev4_6'] += 1
-            latest_count_twm['total'] += 1
+            rebuild[group] = [category for category in rebuild[group]
+                              if not manifest_unit_fresh(manifest, args.output_dir, unit_name(category), inputs)]
+        # 有 --export-db 時即使報表都不需更新，仍要解析並匯出
+        if not any(rebuild.values()) and exporter is None:
+            print("All reports are up to date, nothing to regenerate.")
+            if cache is not None:
+                cache.close()
+            return out_folders
+        for group, label in (("detail", "latest month reports"), ("counts", "log counts"), ("trend", "trend charts")):
+            if rebuild[group]:
+                print(f"Regenerating {label} for {', '.join(rebuild[group])}")
+        for group, (unit_name, inputs) in units.items():
+            for category in rebuild[group]:
+                remove_unit_outputs(manifest, args.output_dir, unit_name(category))
+    detail_categories = rebuild["detail"]
+    build_detail = bool(detail_categories) or exporter is not None
+    # 只重新產生最新月份的明細報表時不需要讀取歷史月份
+    count_files = unique_files if rebuild["counts"] or rebuild["trend"] or export_history else [latest_file]
+    # 最新月份的 Sev0-3 明細在讀檔時即串流寫入各資料夾的 logAnalysis CSV
+    # --sketch 時改用固定記憶體的近似統計 (SketchDetailSink)
+    sinks = {}
+    write_rows = "analysis" in stages
+    if args.sketch:
+        sinks = {category: SketchDetailSink(out_folders[category], month_suffix, args.sketch_epsilon,
+                                            args.sketch_delta, args.sketch_hll_error, args.sketch_devices,
+                                            args.templates, write_rows)
+                 for category in detail_categories}
+        if build_detail:
+            # 不輸出報表的類別也要有 sketch 統計，否則會退回精確的 severity 字典，記憶體隨 syslog type 數量成長
+            for category in index.all_categories:
+                if category not in sinks:
+                    sinks[category] = SketchDetailSink(None, month_suffix, args.sketch_epsilon, args.sketch_delta,
+                                                       args.sketch_hll_error, args.sketch_devices, write_rows=False)
+    else:
+        sinks = {category: DetailSink(out_folders[category], month_suffix, args.templates, write_rows)
+                 for category in detail_categories}
+    if cache is not None:
+        with metrics.stage("cache_lookup"):
+            for file in count_files:
+                # 最新月份需要明細時一定重新解析
+                if (file != latest_file or not build_detail) and not export_history:
+                    cached = load_cached_counts(cache, fingerprints[file], device_version, index.all_categories)
+                    if cached is not None:
+                        file_counts[file] = cached
+        metrics.count("cached_files", len(file_counts))
+        if file_counts:
+            print(f"Loaded {len(file_counts)} historical files from cache {args.cache_file}")
+    history_files = [file for file in count_files
+                     if (file != latest_file or not build_detail) and file not in file_counts]
+    # 匯出、爆量偵測與近似統計需要每一筆解析結果，最新月份不切分片，而要匯出的歷史月份也改由主行程處理
+    # 爆量偵測 (--storm)：最新月份讀檔時同時累計每小時 / 每分鐘的數量
+    histogram = StormHistogram(index.all_categories, args.storm_devices, args.storm_types) \
+        if args.storm and detail_categories else None
+    shard_latest = (build_detail and args.shards > 1 and not is_compressed(latest_file) and exporter is None
+                    and histogram is None and not args.sketch)
+    # 讀取階段包含歷史與最新月份 (平行模式下兩者同時進行)，以及明細串流寫出
+    stats = metrics.reads
+    latest_result = None
+    with metrics.stage("ingest"):
+        if (args.jobs > 1 and history_files and not export_history) or shard_latest:
+            # 平行模式：歷史月份交給行程池，最新月份由主行程處理或切成分片交給行程池；
+            # 合併時依選取順序及檔案順序，結果與逐一處理相同
+            workers = args.jobs if args.jobs > 1 else args.shards
+            print(f"Processing {len(history_files)} historical files with {workers} worker processes")
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_count_worker,
+                                     initargs=(index,)) as executor:
+                futures = {file: executor.submit(count_file_worker, file) for file in history_files}
+                if shard_latest:
+                    latest_result = ingest_file_sharded(executor, latest_file, index, args.shards, sinks, stats)
+                elif build_detail:
+                    latest_result = ingest_file(latest_file, index, detail=True, sinks=sinks, keep_rows=False,
+                                                exporter=exporter, histogram=histogram, stats=stats)
+                for file in tqdm(history_files, desc="Historical Processing (parallel)"):
+                    file_counts[file], file_stats = futures[file].result()
+                    merge_read_stats(stats, file_stats)
         else:
-            if 0 <= severity <= 6:
-                type_matches = re.findall(r"(%[^:]+):", line)
-                syslog_type = type_matches[-1] if type_matches else "Unknown"
-                if syslog_type not in severity_latest_unknown:
-                    severity_latest_unknown[syslog_type] = {'severity': severity, 'count': 0}
-                severity_latest_unknown[syslog_type]['count'] += 1
-            if 0 <= severity <= 3:
-                latest_count_unknown['sev0_3'] += 1
-                log_analysis_latest_unknown.append({
-                    "Severity": severity,
-                    "Device IP": device_ip,
-                    "Syslog Message": line
-                })
-            elif 4 <= severity <= 6:
-                latest_count_unknown['sev4_6'] += 1
-            latest_count_unknown['total'] += 1
-    for row in log_analysis_latest_tfn:
-        ip = row["Device IP"]
-        row["Hostname"] = mapping_tfn.get(ip, "N/A")
-    for row in log_analysis_latest_twm:
-        ip = row["Device IP"]
-        row["Hostname"] = mapping_twm.get(ip, "N/A")
-    for row in log_analysis_latest_unknown:
-        row["Hostname"] = "N/A"
-    timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-    out_folder_tfn = f"DCN_Syslog_TFN_{timestamp}"
-    out_folder_twm = f"DCN_Syslog_TWM_{timestamp}"
-    out_folder_unknown = f"DCN_Syslog_UNKNOWN_{timestamp}"
-    os.makedirs(out_folder_tfn, exist_ok=True)
-    os.makedirs(out_folder_twm, exist_ok=True)
-    os.makedirs(out_folder_unknown, exist_ok=True)
-    output_severity_count(out_folder_tfn, month_suffix, severity_latest_tfn)
-    output_severity_count(out_folder_twm, month_suffix, severity_latest_twm)
-    output_severity_count(out_folder_unknown, month_suffix, severity_latest_unknown)
-    output_log_analysis(out_folder_tfn, month_suffix, log_analysis_latest_tfn)
-    output_log_analysis(out_folder_twm, month_suffix, log_analysis_latest_twm)
-    output_log_analysis(out_folder_unknown, month_suffix, log_analysis_latest_unknown)
-    output_log_count(out_folder_tfn, month_suffix, historical_counts_tfn)
-    output_log_count(out_folder_twm, month_suffix, historical_counts_twm)
-    output_log_count(out_folder_unknown, month_suffix, historical_counts_unknown)
-    output_log_analysis_simple(out_folder_tfn, month_suffix, log_analysis_latest_tfn)
-    output_log_analysis_simple(out_folder_twm, month_suffix, log_analysis_latest_twm)
-    output_log_analysis_simple(out_folder_unknown, month_suffix, log_analysis_latest_unknown)
-    output_trend(out_folder_tfn, historical_counts_tfn)
-    output_trend(out_folder_twm, historical_counts_twm)
-    output_trend(out_folder_unknown, historical_counts_unknown)
-    def output_pie_charts(out_folder, log_rows, month_suffix):
-        """
-        根據 logAnalysis 的資料來產生圓餅圖。
-        以 syslog type 分組，每個圓餅圖統計該 type 各設備 (以 Hostname 為主) 的比例，
-        若超過 5 筆則僅顯示前 5 名，其餘統整為 "Other"。
-        圓餅圖存檔時會移除 log type 中的不合法字元，並正確加上 .png 副檔名，
-        圖中顯示百分比及實際次數。
-        """
-        def make_autopct(values):
-            def my_autopct(pct):
-                total = sum(values)
-                count = int(round(pct*total/100.0))
-                return '{p:.1f}% ({v:d})'.format(p=pct, v=count)
-            return my_autopct
-
-        pie_data = {}
-        for row in log_rows:
-            log_type = extract_log_type(row["Syslog Message"])
-            device = row.get("Hostname", row.get("Device IP", "Unknown"))
-            if log_type not in pie_data:
-                pie_data[log_type] = {}
-            if device not in pie_data[log_type]:
-                pie_data[log_type][device] = 0
-            pie_data[log_type][device] += 1
-
-        for log_type, device_counts in pie_data.items():
-            log_type_clean = re.sub(r'[\\/*?:"<>|%]', '', log_type)
-            sorted_devices = sorted(device_counts.items(), key=lambda x: x[1], reverse=True)
-            if len(sorted_devices) > 5:
-                top_devices = sorted_devices[:5]
-                others_total = sum(count for device, count in sorted_devices[5:])
-                top_devices.append(("Other", others_total))
+            for file in history_files:
+                file_counts[file] = result_counts(ingest_file(file, index, stats=stats,
+                                                              exporter=exporter if export_history else None))
+            if build_detail:
+                latest_result = ingest_file(latest_file, index, detail=True, sinks=sinks, keep_rows=False,
+                                            exporter=exporter, histogram=histogram, stats=stats)
+        for sink in sinks.values():
+            sink.close()
+        if exporter is not None:
+            exporter.close()
+            print(f"Parsed records exported to {args.export_db}")
+    parsed_files = list(history_files)
+    if latest_result is not None:
+        file_counts[latest_file] = result_counts(latest_result)
+        parsed_files.append(latest_file)
+    for counts in file_counts[latest_file].values():
+        for key, value in counts.items():
+            metrics.count(f"latest_{key}", value)
+    if cache is not None:
+        with metrics.stage("cache_store"):
+            for file in parsed_files:
+                store_cached_counts(cache, fingerprints[file], device_version, file_counts[file])
+            cache.commit()
+            cache.close()
+    # 歷史資料統計（用於折線圖）：{category: {YYYYMM: counts}}
+    historical_counts = {category: {} for category in categories}
+    for file in count_files:
+        for category in categories:
+            historical_counts[category][month_key(file)] = file_counts[file][category]
+    # ② 最新月份資料分析（取自同一次讀取的結果），每個類別分別輸出
+    for category in categories:
+        out_folder = out_folders[category]
+        if category in detail_categories and "severity" in stages:
+            if args.sketch:
+                output_severity_count(out_folder, month_suffix, sinks[category].severity_counts)
+                output_sketch_types(out_folder, month_suffix, sinks[category].type_summary())
             else:
-                top_devices = sorted_devices
-            labels = [device for device, count in top_devices]
-            sizes = [count for device, count in top_devices]
-            plt.figure(figsize=(8, 8))
-            plt.pie(sizes, labels=labels, autopct=make_autopct(sizes), startangle=140)
-            plt.title(f"{log_type_clean} ({month_suffix})")
-            pie_filename = os.path.join(out_folder, f"{log_type_clean}_pie_{month_suffix}.png")
-            plt.savefig(pie_filename)
-            plt.close()
-    output_pie_charts(out_folder_tfn, log_analysis_latest_tfn, month_suffix)
-    output_pie_charts(out_folder_twm, log_analysis_latest_twm, month_suffix)
-    output_pie_charts(out_folder_unknown, log_analysis_latest_unknown, month_suffix)
+                output_severity_count(out_folder, month_suffix, latest_result[category]["severity"])
+        if category in rebuild["counts"]:
+            output_log_count(out_folder, month_suffix, historical_counts[category])
+        if category in detail_categories and "analysis" in stages:
+            output_log_analysis_simple(out_folder, month_suffix, sinks[category].simple_dict)
+        if category in detail_categories and args.templates:
+            output_log_templates(out_folder, month_suffix, sinks[category].templates)
+    if histogram is not None:
+        with metrics.stage("storm_detect"):
+            storms = histogram.detect(args.storm_threshold)
+        for category in detail_categories:
+            output_storm_report(out_folders[category], month_suffix, latest_month, histogram, storms, category)
+        print(f"Detected {len(storms)} log storm buckets")
+    # ③ 圖表繪製：所有類別的折線圖與圓餅圖一起交給同一個繪圖階段 (可用 --no-charts 跳過)
+    with metrics.stage("chart_specs"):
+        chart_specs = []
+        for category in rebuild["trend"]:
+            chart_specs += trend_chart_specs(out_folders[category], historical_counts[category])
+        if "pie" in stages:
+            for category in detail_categories:
+                chart_specs += pie_chart_specs(out_folders[category], sinks[category].pie_data, month_suffix,
+                                               args.top_types)
+    if chart_specs:
+        metrics.count("charts", len(chart_specs))
+        render_charts(chart_specs, args.chart_jobs)
+    if manifest is not None:
+        outputs = {"detail": lambda out_folder: [name for name in os.listdir(out_folder)
+                                                 if is_detail_output(name, month_suffix)],
+                   "counts": lambda out_folder: [f"logCount_{month_suffix}.csv"],
+                   "trend": lambda out_folder: ["log_trend_0-3.png", "log_trend_4-6.png"]}
+        for group, (unit_name, inputs) in units.items():
+            for category in rebuild[group]:
+                out_folder = out_folders[category]
+                record_unit_outputs(manifest, args.output_dir, unit_name(category), inputs,
+                                    [os.path.join(out_folder, name) for name in outputs[group](out_folder)
+                                     if os.path.exists(os.path.join(out_folder, name))])
+        save_manifest(args.output_dir, manifest)
+    for category in categories:
+        metrics.write(out_folders[category], {"category": category, "latest_month": latest_month,
+                                              "months": [month_key(file) for file in unique_files],
+                                              "latest_counts": file_counts[latest_file][category],
+                                              "regenerated": [group for group in units
+                                                              if category in rebuild[group]]})
     print("\nAnalysis complete!")
-    print("TFN output files are saved in folder:", out_folder_tfn)
-    print("TWM output files are saved in folder:", out_folder_twm)
-    print("UNKNOWN output files are saved in folder:", out_folder_unknown)
+    for category in categories:
+        print(f"{category} output files are saved in folder:", out_folders[category])
+    return out_folders
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,385 @@
+# 解析效能基準測試：比較舊版逐次 regex 擷取與 SyslogRecord 單次解析的每秒處理行數，
+# 訊息範本歸納 (TemplateMiner) 的處理速度，近似統計模式 (--sketch) 與精確模式的結果與記憶體比較，
+# 以及以 dcnSyslogGenerator 產生的資料逐階段量測完整流程 (--stages)
+import os
+import re
+import sys
+import math
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from dcnSyslogAnalyzer import (
+    parse_record, DeviceIndex, DetailSink, SketchDetailSink, HyperLogLog, TemplateMiner, new_ingest_result, ingest_lines,
+    ingest_file, iter_lines, load_device_list, month_key, output_severity_count, output_log_count,
+    output_log_analysis_simple, trend_chart_specs, pie_chart_specs, render_charts, result_counts, peak_rss_mb,
+    SKETCH_EPSILON, SKETCH_DELTA, SKETCH_HLL_ERROR, SKETCH_DEVICES_PER_TYPE,
+)
+from dcnSyslogGenerator import generate
+
+# 逐階段量測的預設資料量，以及判定為效能退步的變動比例 (--baseline)
+STAGE_SIZES = "1M,10M,50M"
+STAGES = ["read", "parse", "aggregate", "csv", "charts"]
+REGRESSION_TOLERANCE = 0.10
+# --sketch 的檢查門檻：前 N 個 syslog type 的最低召回率，不重複設備數容許的 HLL 標準誤差倍數
+SKETCH_MIN_RECALL = 0.9
+# --templates 的目標速度 (每秒數十萬行)
+TEMPLATE_TARGET_RATE = 200000
+SKETCH_HLL_SIGMAS = 3
+
+SAMPLE_MESSAGES = [
+    "Interface GigabitEthernet0/{port} changed state to down",
+    "Line protocol on Interface Vlan{vlan}, changed state to up",
+    "Neighbor {ip} Down BGP Notification sent",
+    "Nbr {ip} on Vlan{vlan} from FULL to DOWN, Neighbor Down: Dead timer expired",
+    "Memory allocation of {size} bytes failed from 0x{addr:x}",
+    "Configured from console by admin on vty{vty} ({ip})",
+]
+
+SAMPLE_TYPES = [
+    "%LINK-3-UPDOWN", "%LINEPROTO-5-UPDOWN", "%SYS-2-MALLOCFAIL", "%OSPF-4-ERR",
+    "%BGP-5-ADJCHANGE", "%SEC-1-ATTACK", "%SNMP-7-DEBUG", "%PLATFORM-0-CRASH",
+]
+
+def make_sample_lines(count, seed=0):
+    """
+    產生格式與 YYYYMM.txt 相同的測試行 ("Mon DD HH:MM:SS <IP> <seq>: %FAC-SEV-MNEMONIC: ...")。
+    """
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        lines.append(
+            f"Mar {rng.randint(1, 31):2d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} "
+            f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.{rng.randint(1, 254)} {rng.randint(1, 99999)}: "
+            f"{rng.choice(SAMPLE_TYPES)}: Interface GigabitEthernet0/{rng.randint(0, 48)} changed state to down")
+    return lines
+
+def make_message_lines(count, seed=0):
+    """
+    與 make_sample_lines 相同格式，但訊息內容取自 SAMPLE_MESSAGES 並帶入隨機的介面、IP、數值，
+    用於範本歸納的測試。
+    """
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        message = rng.choice(SAMPLE_MESSAGES).format(
+            port=rng.randint(0, 48), vlan=rng.randint(1, 4094), size=rng.randint(64, 1 << 20),
+            addr=rng.getrandbits(32), vty=rng.randint(0, 15),
+            ip=f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}")
+        lines.append(
+            f"Mar {rng.randint(1, 31):2d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} "
+            f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.{rng.randint(1, 254)} {rng.randint(1, 99999)}: "
+            f"{rng.choice(SAMPLE_TYPES)}: {message}")
+    return lines
+
+def legacy_parse(line):
+    """
+    重現改版前每一行 Sev0-3 明細實際經過的解析：main() 的 severity / syslog type，
+    以及 output_log_analysis、output_log_analysis_simple、output_pie_charts 各自重新擷取的欄位。
+    """
+    sev_match = re.search(r"%\S+-(\d)-\S+:", line)
+    if not sev_match:
+        return None
+    severity = int(sev_match.group(1))
+    tokens = line.split()
+    if len(tokens) < 4:
+        return None
+    device_ip = tokens[3]
+    type_matches = re.findall(r"(%[^:]+):", line)
+    syslog_type = type_matches[-1] if type_matches else "Unknown"
+    log_type = re.search(r"(%\S+)", line).group(1)
+    tokens = line.split()
+    day = tokens[0] + " " + tokens[1]
+    simple_type = re.findall(r"(%[^:]+):", line)[-1]
+    simple_log_type = re.search(r"(%\S+)", line).group(1)
+    pie_log_type = re.search(r"(%\S+)", line).group(1)
+    return severity, device_ip, syslog_type, log_type, day, simple_type, simple_log_type, pie_log_type
+
+def record_parse(line):
+    record = parse_record(line)
+    if record is None:
+        return None
+    return record.severity, record.device_ip, record.syslog_type, record.log_type, record.day
+
+def time_parser(parser, lines, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            parser(line)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(lines) / best
+
+def bench_parse(lines, repeat):
+    legacy_rate = time_parser(legacy_parse, lines, repeat)
+    record_rate = time_parser(record_parse, lines, repeat)
+    print(f"legacy regex parsing : {legacy_rate:>12,.0f} lines/sec")
+    print(f"SyslogRecord parsing : {record_rate:>12,.0f} lines/sec")
+    print(f"speedup              : {record_rate / legacy_rate:>12.2f}x")
+
+def bench_templates(lines, repeat):
+    records = [parse_record(line) for line in lines]
+    best = None
+    for _ in range(repeat):
+        miner = TemplateMiner()
+        start = time.perf_counter()
+        for record in records:
+            miner.add(record)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    rate = len(records) / best
+    print(f"TemplateMiner        : {rate:>12,.0f} lines/sec "
+          f"(target {TEMPLATE_TARGET_RATE:,}: {'met' if rate >= TEMPLATE_TARGET_RATE else f'{rate / TEMPLATE_TARGET_RATE:.0%} of target'})")
+    print(f"templates found      : {len(miner.clusters):>12,} "
+          f"({len(SAMPLE_MESSAGES)} message formats x {len(SAMPLE_TYPES)} syslog types)")
+
+def make_skewed_lines(count, type_count, device_count, seed=0):
+    """
+    產生高基數的測試行：syslog type 與設備皆依 1/rank 的偏斜分布抽樣，訊息內容含流水號 (每行都不同)。
+    回傳 (lines, DeviceIndex)，設備全部登記在 TFN 類別。
+    """
+    rng = random.Random(seed)
+    types = [f"%FAC{n}-{rng.randint(0, 6)}-EVENT{n}" for n in range(type_count)]
+    devices = [f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}" for n in range(device_count)]
+    index = DeviceIndex()
+    for n, device in enumerate(devices):
+        index.add("TFN", f"host{n}", device)
+    type_weights = [1 / (rank + 1) for rank in range(type_count)]
+    device_weights = [1 / (rank + 1) for rank in range(device_count)]
+    chosen_types = rng.choices(types, type_weights, k=count)
+    chosen_devices = rng.choices(devices, device_weights, k=count)
+    lines = [f"Mar {rng.randint(1, 31):2d} 12:00:00 {device} {n}: {syslog_type}: message {n}"
+             for n, (syslog_type, device) in enumerate(zip(chosen_types, chosen_devices))]
+    return lines, index
+
+def run_detail(lines, index, sink_factory):
+    """
+    以 detail 模式彙整 lines，回傳 (TFN 類別的 sink, severity 字典, 執行秒數, tracemalloc 峰值位元組)。
+    """
+    with tempfile.TemporaryDirectory() as out_folder:
+        tracemalloc.start()
+        start = time.perf_counter()
+        sink = sink_factory(out_folder)
+        sinks = {category: sink_factory(out_folder) if category != "TFN" else sink
+                 for category in index.all_categories}
+        result = new_ingest_result(index.all_categories, sinks)
+        ingest_lines(result, lines, index, detail=True)
+        severity = sink.severity_counts if sink.sketch else result["TFN"]["severity"]
+        simple_dict = sink.simple_dict
+        pie_data = sink.pie_data
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        for category_sink in sinks.values():
+            category_sink.close()
+    return sink, severity, simple_dict, pie_data, elapsed, peak
+
+def bench_sketch(lines, index, args, top=10):
+    """
+    近似模式與精確模式的比較：前 N 個 syslog type 的召回率與計數誤差 (對照 epsilon × 總筆數的上限)、
+    不重複設備數的相對誤差、圓餅圖前 5 名設備的一致程度，以及處理時間與記憶體峰值。
+    回傳未通過的檢查 (計數不可低估且高估不超過 epsilon × 總筆數、召回率不低於 min_recall、
+    不重複設備數誤差不超過 SKETCH_HLL_SIGMAS 倍 HLL 標準誤差)，全部通過時為空列表。
+    """
+    exact_sink, exact_severity, exact_simple, exact_pie, exact_time, exact_peak = run_detail(
+        lines, index, lambda out_folder: DetailSink(out_folder, "03"))
+    sketch_sink, sketch_severity, sketch_simple, sketch_pie, sketch_time, sketch_peak = run_detail(
+        lines, index, lambda out_folder: SketchDetailSink(out_folder, "03", args.epsilon, args.delta,
+                                                          args.hll_error, args.devices))
+    total = sum(data['count'] for data in exact_severity.values())
+    exact_top = sorted(exact_severity, key=lambda syslog_type: exact_severity[syslog_type]['count'], reverse=True)
+    sketch_top = sorted(sketch_severity, key=lambda syslog_type: sketch_severity[syslog_type]['count'], reverse=True)
+    recall = len(set(exact_top[:top]) & set(sketch_top[:top])) / min(top, len(exact_top))
+    count_errors = [sketch_severity[syslog_type]['count'] - exact_severity[syslog_type]['count']
+                    for syslog_type in sketch_severity]
+    # 不重複設備數：以精確模式的 logAnalysis 明細無法取得 Sev4-6，改由原始行重新計算前 N 個 type
+    distinct = {}
+    for line in lines:
+        record = parse_record(line)
+        if record.syslog_type in exact_top[:top]:
+            distinct.setdefault(record.syslog_type, set()).add(record.device_ip)
+    summary = {row[0]: row[4] for row in sketch_sink.type_summary()}
+    distinct_errors = [abs(summary[syslog_type] - len(devices)) / len(devices)
+                       for syslog_type, devices in distinct.items() if syslog_type in summary]
+    pie_types = sorted(exact_pie, key=lambda log_type: sum(exact_pie[log_type].values()), reverse=True)[:top]
+    pie_matches = []
+    for log_type in pie_types:
+        exact_devices = sorted(exact_pie[log_type], key=exact_pie[log_type].get, reverse=True)[:5]
+        sketch_devices = [device for device in sketch_pie.get(log_type, {}) if device is not None]
+        pie_matches.append(len(set(exact_devices) & set(sketch_devices)) / len(exact_devices))
+    print(f"rows (sev0-6)               : {total:>12,}")
+    print(f"top-{top} syslog type recall   : {recall:>12.0%}")
+    print(f"max count overestimate      : {max(count_errors):>12,} (bound epsilon x rows = {args.epsilon * total:,.0f})")
+    print(f"max distinct device error   : {max(distinct_errors):>12.1%} (HLL standard error {args.hll_error:.1%})")
+    print(f"pie top-5 device agreement  : {sum(pie_matches) / len(pie_matches):>12.0%}")
+    print(f"logAnalysis_simple groups   : {len(exact_simple):>12,} exact / {len(sketch_simple):,} sketch")
+    print(f"time (with tracemalloc)     : {exact_time:>12.2f}s exact / {sketch_time:.2f}s sketch")
+    print(f"peak traced memory          : {exact_peak / 1e6:>12.1f}MB exact / {sketch_peak / 1e6:.1f}MB sketch")
+    failures = []
+    if min(count_errors) < 0:
+        failures.append(f"count underestimated by {-min(count_errors):,}")
+    if max(count_errors) > args.epsilon * total:
+        failures.append(f"count overestimate {max(count_errors):,} exceeds epsilon x rows = {args.epsilon * total:,.0f}")
+    if recall < args.min_recall:
+        failures.append(f"top-{top} recall {recall:.0%} is below {args.min_recall:.0%}")
+    # 暫存器數量有上限，實際的標準誤差可能大於 --hll-error
+    hll_error = max(args.hll_error, 1.04 / math.sqrt(1 << HyperLogLog(args.hll_error).precision))
+    if max(distinct_errors) > SKETCH_HLL_SIGMAS * hll_error:
+        failures.append(f"distinct device error {max(distinct_errors):.1%} exceeds "
+                        f"{SKETCH_HLL_SIGMAS} x HLL standard error ({SKETCH_HLL_SIGMAS * hll_error:.1%})")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("All sketch checks passed")
+    return failures
+
+def parse_size(text):
+    # "1M" / "500K" / "2000000" → 行數
+    text = text.strip().upper()
+    multiplier = {"K": 1000, "M": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("KM")) * multiplier)
+
+def run_stage(stage, file, data_dir, chart_jobs):
+    """
+    子行程工作：在資料目錄中執行單一階段並回傳 (經過秒數, CPU 秒數, 記憶體峰值 MB)。
+    每個階段都是從讀檔開始的完整流程 (read → parse → aggregate → csv)，charts 則只計算繪圖時間：
+      read:      只讀取並解碼每一行
+      parse:     再以 parse_record 完整解析
+      aggregate: ingest_file 的所有統計 (不輸出明細)
+      csv:       串流寫出 logAnalysis 並輸出 severityCount / logCount / logAnalysis_simple
+      charts:    先完成 csv 階段 (不計時)，再繪製趨勢圖與圓餅圖
+    """
+    os.chdir(data_dir)
+    with tempfile.TemporaryDirectory() as out_folder:
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        if stage == "read":
+            for line in iter_lines(file, file, show_progress=False):
+                pass
+        elif stage == "parse":
+            for line in iter_lines(file, file, show_progress=False):
+                parse_record(line.strip())
+        elif stage == "aggregate":
+            ingest_file(file, load_device_list(), detail=True, show_progress=False, keep_rows=False)
+        else:
+            index = load_device_list()
+            sinks = {category: DetailSink(out_folder, "01") for category in index.all_categories}
+            result = ingest_file(file, index, detail=True, show_progress=False, sinks=sinks)
+            for sink in sinks.values():
+                sink.close()
+            counts = result_counts(result)
+            for category in index.all_categories:
+                output_severity_count(out_folder, "01", result[category]["severity"])
+                output_log_count(out_folder, "01", {month_key(file): counts[category]})
+                output_log_analysis_simple(out_folder, "01", sinks[category].simple_dict)
+            if stage == "charts":
+                start = time.perf_counter()
+                cpu_start = time.process_time()
+                specs = []
+                for category in index.all_categories:
+                    specs += trend_chart_specs(out_folder, {month_key(file): counts[category]})
+                    specs += pie_chart_specs(out_folder, sinks[category].pie_data, "01")
+                render_charts(specs, chart_jobs)
+        return time.perf_counter() - start, time.process_time() - cpu_start, peak_rss_mb()
+
+def bench_stages(args):
+    """
+    對每個資料量產生 (或重複使用) 合成資料，逐階段在獨立的子行程中執行，
+    回報 lines/sec 與記憶體峰值，並可與先前的 --output 結果比較。
+    """
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {(row["lines"], row["stage"]): row for row in json.load(f)}
+    stages = args.stage_list.split(",")
+    results = []
+    print(f"{'lines':>12} {'stage':<10} {'seconds':>9} {'cpu':>9} {'lines/sec':>12} {'peak RSS':>10}")
+    for size in [parse_size(size) for size in args.sizes.split(",")]:
+        data_dir = os.path.abspath(os.path.join(args.data_dir, str(size)))
+        file = "202501.txt"
+        if not os.path.exists(os.path.join(data_dir, file)):
+            print(f"Generating {size:,} lines in {data_dir}")
+            generate(data_dir, ["202501"], size, args.device_count, args.type_count)
+        for stage in stages:
+            # 每個階段使用新的子行程，記憶體峰值不受其他階段影響
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                elapsed, cpu, peak = executor.submit(run_stage, stage, file, data_dir, args.chart_jobs).result()
+            row = {"lines": size, "stage": stage, "seconds": round(elapsed, 3), "cpu_seconds": round(cpu, 3),
+                   "lines_per_sec": round(size / elapsed) if stage != "charts" else None,
+                   "peak_rss_mb": round(peak, 1) if peak is not None else None}
+            results.append(row)
+            rate = f"{row['lines_per_sec']:>12,}" if row["lines_per_sec"] is not None else f"{'-':>12}"
+            memory = f"{row['peak_rss_mb']:>8.1f}MB" if row["peak_rss_mb"] is not None else f"{'n/a':>10}"
+            note = ""
+            previous = baseline.get((size, stage))
+            if previous is not None:
+                change = elapsed / previous["seconds"] - 1
+                note = f"  {change:+.1%}" + ("  REGRESSION" if change > args.tolerance else "")
+            print(f"{size:>12,} {stage:<10} {elapsed:>9.2f} {cpu:>9.2f} {rate} {memory}{note}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+def main():
+    parser = argparse.ArgumentParser(description="DCN syslog analyzer micro-benchmarks")
+    parser.add_argument("--lines", type=int, default=200000, help="number of synthetic lines (default: 200000)")
+    parser.add_argument("--repeat", type=int, default=3, help="best-of-N repetitions (default: 3)")
+    parser.add_argument("--stages", action="store_true",
+                        help="time each pipeline stage (read, parse, aggregate, csv, charts) on generated data")
+    parser.add_argument("--sizes", default=STAGE_SIZES,
+                        help=f"with --stages, comma separated line counts, K/M suffixes allowed (default: {STAGE_SIZES})")
+    parser.add_argument("--stage-list", default=",".join(STAGES),
+                        help=f"with --stages, stages to run (default: {','.join(STAGES)})")
+    parser.add_argument("--data-dir", default="dcnSyslogBench_data",
+                        help="with --stages, where generated files are kept and reused (default: dcnSyslogBench_data)")
+    parser.add_argument("--type-count", type=int, default=300,
+                        help="with --stages, distinct syslog types in generated data (default: 300)")
+    parser.add_argument("--chart-jobs", type=int, default=1,
+                        help="with --stages, worker processes for the charts stage (default: 1)")
+    parser.add_argument("--output", default=None, help="with --stages, write the results as JSON")
+    parser.add_argument("--baseline", default=None,
+                        help="with --stages, compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help=f"with --baseline, slowdown flagged as a regression (default: {REGRESSION_TOLERANCE})")
+    parser.add_argument("--templates", action="store_true",
+                        help="time the message template miner instead of the parser")
+    parser.add_argument("--sketch", action="store_true",
+                        help="compare --sketch approximate mode against exact mode instead of timing the parser")
+    parser.add_argument("--types", type=int, default=20000, help="with --sketch, distinct syslog types (default: 20000)")
+    parser.add_argument("--devices", type=int, default=SKETCH_DEVICES_PER_TYPE,
+                        help=f"with --sketch, devices tracked per log type (default: {SKETCH_DEVICES_PER_TYPE})")
+    parser.add_argument("--device-count", type=int, default=None,
+                        help="with --sketch or --stages, distinct devices (default: 5000 / 2000)")
+    parser.add_argument("--epsilon", type=float, default=SKETCH_EPSILON,
+                        help=f"with --sketch, sketch error bound (default: {SKETCH_EPSILON})")
+    parser.add_argument("--delta", type=float, default=SKETCH_DELTA,
+                        help=f"with --sketch, Count-Min failure probability (default: {SKETCH_DELTA})")
+    parser.add_argument("--hll-error", type=float, default=SKETCH_HLL_ERROR,
+                        help=f"with --sketch, HyperLogLog relative error (default: {SKETCH_HLL_ERROR})")
+    parser.add_argument("--min-recall", type=float, default=SKETCH_MIN_RECALL,
+                        help=f"with --sketch, minimum top-10 syslog type recall (default: {SKETCH_MIN_RECALL})")
+    args = parser.parse_args()
+    if args.stages:
+        if args.device_count is None:
+            args.device_count = 2000
+        bench_stages(args)
+        return
+    if args.sketch:
+        lines, index = make_skewed_lines(args.lines, args.types, args.device_count or 5000)
+        if bench_sketch(lines, index, args):
+            sys.exit(1)
+        return
+    if args.templates:
+        bench_templates(make_message_lines(args.lines), args.repeat)
+        return
+    lines = make_sample_lines(args.lines)
+    bench_parse(lines, args.repeat)
+
+if __name__ == "__main__":
+    main()
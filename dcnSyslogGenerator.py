@@ -0,0 +1,168 @@
+# 合成 syslog 產生器：輸出與設備匯出檔相同格式的 YYYYMM.txt 以及對應的 deviceList_v1.csv，
+# 供效能測試使用 (不需要正式環境的 log)
+import os
+import random
+import argparse
+import calendar
+import itertools
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+FACILITIES = ["LINK", "LINEPROTO", "SYS", "OSPF", "BGP", "SEC", "SNMP", "PLATFORM", "STP", "DOT1X", "LLDP", "NTP"]
+
+MESSAGE_FORMATS = [
+    "Interface GigabitEthernet{slot}/{port} changed state to {state}",
+    "Line protocol on Interface Vlan{vlan}, changed state to {state}",
+    "Neighbor {ip} {state} BGP Notification sent",
+    "Nbr {ip} on Vlan{vlan} from FULL to DOWN, Neighbor Down: Dead timer expired",
+    "Memory allocation of {size} bytes failed from 0x{addr:x}",
+    "Configured from console by admin on vty{vty} ({ip})",
+    "Temperature sensor {slot} reading {size} exceeds threshold",
+]
+
+# 預設的 severity 比例 (依行數)，格式同 --severity-mix
+DEFAULT_SEVERITY_MIX = "0:1,1:1,2:2,3:6,4:10,5:30,6:45,7:5"
+# 每批產生的行數，以及預先組好的訊息內容數量 (每行從中抽樣，避免逐行組字串)
+BLOCK_LINES = 100000
+MESSAGE_POOL_SIZE = 4096
+
+def parse_severity_mix(text):
+    """
+    "0:1,3:6,..." → {severity: weight}。
+    """
+    mix = {}
+    for item in text.split(","):
+        severity, weight = item.split(":")
+        mix[int(severity)] = float(weight)
+    return mix
+
+def make_devices(count, categories, unknown_ratio, rng):
+    """
+    回傳 [(ip, hostname, category)]；category 為 None 的設備不列入設備清單 (分析時歸類為 UNKNOWN)。
+    """
+    devices = []
+    for n in range(count):
+        ip = f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+        category = None if rng.random() < unknown_ratio else categories[n % len(categories)]
+        devices.append((ip, f"{(category or 'dev').lower()}-sw{n:05d}", category))
+    return devices
+
+def make_types(count, severity_mix, rng):
+    """
+    依 severity 比例分配 syslog type，回傳 ([type], [累積權重])。
+    同一 severity 內各 type 的出現次數依 1/rank 偏斜，整體 severity 比例則符合 severity_mix。
+    """
+    total = sum(severity_mix.values())
+    types = []
+    weights = []
+    for severity, weight in severity_mix.items():
+        share = max(1, round(count * weight / total))
+        ranks = [1 / (rank + 1) for rank in range(share)]
+        norm = sum(ranks)
+        for rank in range(share):
+            facility = rng.choice(FACILITIES)
+            types.append(f"%{facility}-{severity}-EVENT{len(types)}")
+            weights.append(weight / total * ranks[rank] / norm)
+    return types, list(itertools.accumulate(weights))
+
+def make_message_pool(rng, size=MESSAGE_POOL_SIZE):
+    pool = []
+    for _ in range(size):
+        pool.append(rng.choice(MESSAGE_FORMATS).format(
+            slot=rng.randint(0, 8), port=rng.randint(0, 48), state=rng.choice(["up", "down"]),
+            vlan=rng.randint(1, 4094), size=rng.randint(64, 1 << 20), addr=rng.getrandbits(32),
+            vty=rng.randint(0, 15), ip=f"172.{rng.randint(16, 31)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"))
+    return pool
+
+def generate_month(path, month, lines, devices, types, type_weights, rng, noise_ratio=0.01, device_skew=1.0):
+    """
+    寫出一個月份的 YYYYMM.txt：時間戳記在當月平均分布且依序遞增，tokens[3] 為設備 IP，
+    訊息為 "<流水號>: %FAC-SEV-MNEMONIC: 內容"；noise_ratio 比例的行不含 severity (分析時會略過)。
+    """
+    year, month_number = int(month[:4]), int(month[4:])
+    month_name = MONTH_NAMES[month_number - 1]
+    seconds = calendar.monthrange(year, month_number)[1] * 86400
+    device_weights = list(itertools.accumulate(1 / (rank + 1) ** device_skew for rank in range(len(devices))))
+    device_ips = [ip for ip, hostname, category in devices]
+    pool = make_message_pool(rng)
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for block_start in range(0, lines, BLOCK_LINES):
+            block = min(BLOCK_LINES, lines - block_start)
+            chosen_devices = rng.choices(device_ips, cum_weights=device_weights, k=block)
+            chosen_types = rng.choices(types, cum_weights=type_weights, k=block)
+            chosen_messages = rng.choices(pool, k=block)
+            output = []
+            for offset in range(block):
+                line_number = block_start + offset
+                second = line_number * seconds // lines
+                day, second = divmod(second, 86400)
+                hour, second = divmod(second, 3600)
+                minute, second = divmod(second, 60)
+                stamp = f"{month_name} {day + 1:2d} {hour:02d}:{minute:02d}:{second:02d}"
+                if rng.random() < noise_ratio:
+                    output.append(f"{stamp} {chosen_devices[offset]} kernel: {chosen_messages[offset]}\n")
+                else:
+                    output.append(f"{stamp} {chosen_devices[offset]} {line_number % 1000000}: "
+                                  f"{chosen_types[offset]}: {chosen_messages[offset]}\n")
+            f.write("".join(output))
+
+def write_device_list(path, devices):
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for ip, hostname, category in devices:
+            if category is not None:
+                f.write(f"{category},{hostname},{ip}\n")
+
+def month_range(start, count):
+    year, month = int(start[:4]), int(start[4:])
+    months = []
+    for _ in range(count):
+        months.append(f"{year:04d}{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+def generate(out_dir, months, lines, device_count=2000, type_count=300, severity_mix=DEFAULT_SEVERITY_MIX,
+             categories=("TFN", "TWM"), unknown_ratio=0.05, noise_ratio=0.01, device_skew=1.0, seed=0):
+    """
+    產生 out_dir/deviceList_v1.csv 與每個月份的 YYYYMM.txt (每月 lines 行)，回傳產生的檔案路徑。
+    所有月份共用同一份設備與 syslog type 清單。
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    devices = make_devices(device_count, list(categories), unknown_ratio, rng)
+    types, type_weights = make_types(type_count, parse_severity_mix(severity_mix), rng)
+    write_device_list(os.path.join(out_dir, "deviceList_v1.csv"), devices)
+    paths = []
+    for month in months:
+        path = os.path.join(out_dir, f"{month}.txt")
+        generate_month(path, month, lines, devices, types, type_weights, rng, noise_ratio, device_skew)
+        paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="generate synthetic YYYYMM.txt syslog exports and a device list")
+    parser.add_argument("--out-dir", default=".", help="output directory (default: .)")
+    parser.add_argument("--start", default="202501", help="first month as YYYYMM (default: 202501)")
+    parser.add_argument("--months", type=int, default=3, help="number of consecutive months (default: 3)")
+    parser.add_argument("--lines", type=int, default=1000000, help="lines per month (default: 1000000)")
+    parser.add_argument("--devices", type=int, default=2000, help="distinct device IPs (default: 2000)")
+    parser.add_argument("--types", type=int, default=300, help="distinct syslog types (default: 300)")
+    parser.add_argument("--severity-mix", default=DEFAULT_SEVERITY_MIX,
+                        help=f"severity:weight pairs by line share (default: {DEFAULT_SEVERITY_MIX})")
+    parser.add_argument("--categories", default="TFN,TWM", help="device list categories (default: TFN,TWM)")
+    parser.add_argument("--unknown-ratio", type=float, default=0.05,
+                        help="share of devices left out of the device list (default: 0.05)")
+    parser.add_argument("--noise-ratio", type=float, default=0.01,
+                        help="share of lines without a %%FAC-SEV-MNEMONIC tag (default: 0.01)")
+    parser.add_argument("--device-skew", type=float, default=1.0,
+                        help="Zipf exponent of per-device volume, 0 for uniform (default: 1.0)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    args = parser.parse_args()
+    paths = generate(args.out_dir, month_range(args.start, args.months), args.lines, args.devices, args.types,
+                     args.severity_mix, args.categories.split(","), args.unknown_ratio, args.noise_ratio,
+                     args.device_skew, args.seed)
+    for path in paths:
+        print(f"Generated {path}")
+    print(f"Generated {os.path.join(args.out_dir, 'deviceList_v1.csv')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# asyncio syslog 接收器：以 UDP / TCP 接收 RFC 3164 / RFC 5424 訊息，
+# 轉成與 YYYYMM.txt 匯出檔相同的格式 ("Mon DD HH:MM:SS <設備 IP> <訊息>") 後批次寫入當月檔案，
+# 並以 dcnSyslogAnalyzer 相同的解析與分類邏輯即時累計統計。
+import os
+import re
+import time
+import socket
+import asyncio
+import argparse
+import datetime
+
+from dcnSyslogAnalyzer import (
+    load_device_list, new_ingest_result, ingest_lines, output_live_snapshot, live_out_folders,
+)
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+# <PRI>，RFC 5424 的版本號，RFC 3164 的 "Mmm dd hh:mm:ss HOST " 標頭
+PRI_PATTERN = re.compile(r"<(\d{1,3})>")
+RFC5424_PATTERN = re.compile(
+    r"1 (?:\d{4}-\d\d-\d\dT\S+|-) \S+ \S+ \S+ \S+ (?:-|(?:\[(?:[^\]\\]|\\.)*\])+) ?")
+RFC3164_HEADER_PATTERN = re.compile(r"[A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d \S+ ")
+
+DEFAULT_PORT = 514
+BATCH_SIZE = 2000
+FLUSH_INTERVAL = 0.2
+MAX_QUEUED_BATCHES = 64
+# TCP 單則訊息的最大長度：octet-counting 的長度超過時視為以數字開頭、以換行分隔的訊息；
+# 以換行分隔時超過此長度仍未收到換行，先將這一段當成一則訊息送出，避免緩衝區無限成長
+MAX_FRAME_LENGTH = 65536
+MAX_FRAME_DIGITS = len(str(MAX_FRAME_LENGTH))
+SNAPSHOT_INTERVAL = 60
+# UDP 接收緩衝區，讓突發流量在 event loop 忙碌時先暫存在核心中
+UDP_RECEIVE_BUFFER = 8 << 20
+
+def format_stamp(received):
+    return f"{MONTH_NAMES[received.month - 1]} {received.day:2d} {received:%H:%M:%S}"
+
+def parse_syslog_message(data, peer_ip, stamp):
+    """
+    將一則 syslog 訊息 (RFC 3164 或 RFC 5424) 轉成匯出檔格式的一行：
+    日期與時間 (stamp，見 format_stamp) 取接收時間，tokens[3] 為傳送端 IP，其後為去除 PRI 與標頭後的訊息內容。
+    """
+    message = data.decode("utf-8", errors="replace").strip()
+    pri_match = PRI_PATTERN.match(message)
+    if pri_match:
+        message = message[pri_match.end():]
+        rfc5424_match = RFC5424_PATTERN.match(message)
+        if rfc5424_match:
+            message = message[rfc5424_match.end():].lstrip("\ufeff")
+        else:
+            rfc3164_match = RFC3164_HEADER_PATTERN.match(message)
+            if rfc3164_match:
+                message = message[rfc3164_match.end():]
+    message = message.replace("\r", " ").replace("\n", " ")
+    return f"{stamp} {peer_ip} {message}"
+
+class SyslogAggregator:
+    """
+    接收端的批次處理：協定物件呼叫 submit() 累積訊息，滿 batch_size 或每 flush_interval 秒送出一批。
+    單一 consumer 依序將每批寫入當月 YYYYMM.txt 並更新統計。
+    佇列中的批次超過 max_batches 時啟動背壓：TCP 連線暫停讀取，UDP 則丟棄該批並計數。
+    """
+    def __init__(self, index, out_dir=".", batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, max_batches=MAX_QUEUED_BATCHES, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.index = index
+        self.out_dir = out_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_batches = max_batches
+        self.snapshot_interval = snapshot_interval
+        self.queue = asyncio.Queue()
+        self.pending = []
+        self.tcp_transports = set()
+        self.paused = False
+        self.received = 0
+        self.stamp_second = None
+        self.stamp = None
+        self.dropped = 0
+        self.month = None
+        self.logfile = None
+        self.result = new_ingest_result(index.all_categories)
+        self.out_folders = live_out_folders(index.all_categories)
+
+    def submit(self, data, peer_ip, droppable=False):
+        # 時間戳記每秒只格式化一次
+        second = int(time.time())
+        if second != self.stamp_second:
+            self.stamp_second = second
+            self.stamp = format_stamp(datetime.datetime.fromtimestamp(second))
+        self.pending.append(parse_syslog_message(data, peer_ip, self.stamp))
+        self.received += 1
+        if len(self.pending) >= self.batch_size:
+            self.flush(droppable)
+
+    def flush(self, droppable=False):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        if self.queue.qsize() >= self.max_batches:
+            if droppable:
+                self.dropped += len(batch)
+                return
+            self.pause_tcp()
+        self.queue.put_nowait(batch)
+
+    def pause_tcp(self):
+        if not self.paused:
+            self.paused = True
+            for transport in self.tcp_transports:
+                transport.pause_reading()
+
+    def resume_tcp(self):
+        if self.paused and self.queue.qsize() <= self.max_batches // 2:
+            self.paused = False
+            for transport in self.tcp_transports:
+                transport.resume_reading()
+
+    def switch_month(self, month):
+        """
+        跨月時輸出上個月最後的統計並改寫入新的 YYYYMM.txt。
+        """
+        if self.logfile is not None:
+            self.snapshot()
+            self.logfile.close()
+        self.month = month
+        self.result = new_ingest_result(self.index.all_categories)
+        self.logfile = open(os.path.join(self.out_dir, f"{month}.txt"), "a", encoding="utf-8",
+                            buffering=1 << 20)
+
+    def process_batch(self, batch):
+        month = datetime.datetime.now().strftime("%Y%m")
+        if month != self.month:
+            self.switch_month(month)
+        self.logfile.write("\n".join(batch))
+        self.logfile.write("\n")
+        ingest_lines(self.result, batch, self.index, detail=True, keep_rows=False)
+
+    def snapshot(self):
+        if self.month is None:
+            return
+        self.logfile.flush()
+        output_live_snapshot(self.out_folders, self.month,
+                             {category: state["counts"] for category, state in self.result.items()},
+                             {category: state["severity"] for category, state in self.result.items()})
+        print(f"[{datetime.datetime.now():%Y-%m-%d %H:%M:%S}] {self.month}: received {self.received}, "
+              f"dropped {self.dropped}")
+
+    async def run_consumer(self):
+        while True:
+            batch = await self.queue.get()
+            self.process_batch(batch)
+            self.resume_tcp()
+
+    async def run_flusher(self):
+        # 流量小時也要定期送出未滿一批的訊息，並定期輸出統計快照
+        last_snapshot = asyncio.get_running_loop().time()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+            now = asyncio.get_running_loop().time()
+            if now - last_snapshot >= self.snapshot_interval:
+                self.snapshot()
+                last_snapshot = now
+
+    async def drain(self):
+        self.flush()
+        while not self.queue.empty():
+            self.process_batch(self.queue.get_nowait())
+        self.snapshot()
+        if self.logfile is not None:
+            self.logfile.close()
+
+class SyslogUDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, aggregator):
+        self.aggregator = aggregator
+
+    def datagram_received(self, data, addr):
+        # UDP 無法要求傳送端放慢，佇列已滿時只能丟棄
+        self.aggregator.submit(data, addr[0], droppable=True)
+
+class SyslogTCPProtocol(asyncio.Protocol):
+    """
+    TCP syslog：支援 RFC 6587 的 octet-counting ("長度 訊息") 與以換行分隔的兩種框架。
+    """
+    def __init__(self, aggregator):
+        self.aggregator = aggregator
+        self.buffer = b""
+        self.peer_ip = None
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.peer_ip = transport.get_extra_info("peername")[0]
+        self.aggregator.tcp_transports.add(transport)
+        if self.aggregator.paused:
+            transport.pause_reading()
+
+    def connection_lost(self, exc):
+        self.aggregator.tcp_transports.discard(self.transport)
+
+    def data_received(self, data):
+        buffer = self.buffer + data
+        position = 0
+        while position < len(buffer):
+            # 只有 "長度 " 開頭 (空白前全為數字且長度合理) 才是 octet-counting，
+            # 數字開頭但無 PRI 的訊息 (例如 "2025-10-17 ...") 仍以換行分隔
+            # 長度欄位最多 MAX_FRAME_DIGITS 位數，不必對很長的數字串呼叫 int()
+            space = buffer.find(b" ", position, position + MAX_FRAME_DIGITS + 1) \
+                if buffer[position:position + 1].isdigit() else -1
+            if space >= 0 and buffer[position:space].isdigit() and int(buffer[position:space]) <= MAX_FRAME_LENGTH:
+                length = int(buffer[position:space])
+                if len(buffer) < space + 1 + length:
+                    break
+                self.aggregator.submit(buffer[space + 1:space + 1 + length], self.peer_ip)
+                position = space + 1 + length
+            else:
+                newline = buffer.find(b"\n", position)
+                if newline < 0:
+                    if len(buffer) - position > MAX_FRAME_LENGTH:
+                        self.aggregator.submit(buffer[position:position + MAX_FRAME_LENGTH], self.peer_ip)
+                        position += MAX_FRAME_LENGTH
+                        continue
+                    break
+                if newline > position:
+                    self.aggregator.submit(buffer[position:newline], self.peer_ip)
+                position = newline + 1
+        self.buffer = buffer[position:]
+
+async def serve(args):
+    index = load_device_list()
+    aggregator = SyslogAggregator(index, args.out_dir, args.batch_size, args.flush_interval,
+                                  args.max_batches, args.snapshot_interval)
+    loop = asyncio.get_running_loop()
+    udp_transport, _ = await loop.create_datagram_endpoint(lambda: SyslogUDPProtocol(aggregator),
+                                                           local_addr=(args.host, args.port))
+    udp_socket = udp_transport.get_extra_info("socket")
+    udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, args.udp_buffer)
+    tcp_server = await loop.create_server(lambda: SyslogTCPProtocol(aggregator), args.host, args.port)
+    print(f"Listening for syslog on {args.host}:{args.port} (UDP and TCP)")
+    tasks = [asyncio.create_task(aggregator.run_consumer()), asyncio.create_task(aggregator.run_flusher())]
+    try:
+        if args.duration:
+            await asyncio.sleep(args.duration)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        udp_transport.close()
+        tcp_server.close()
+        for task in tasks:
+            task.cancel()
+        await aggregator.drain()
+
+def main():
+    parser = argparse.ArgumentParser(description="DCN syslog UDP/TCP receiver")
+    parser.add_argument("--host", default="0.0.0.0", help="listen address (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"listen port (default: {DEFAULT_PORT})")
+    parser.add_argument("--out-dir", default=".", help="directory for the YYYYMM.txt files (default: .)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"messages per write/aggregate batch (default: {BATCH_SIZE})")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL,
+                        help=f"seconds before a partial batch is flushed (default: {FLUSH_INTERVAL})")
+    parser.add_argument("--max-batches", type=int, default=MAX_QUEUED_BATCHES,
+                        help="queued batches before TCP reads are paused and UDP batches are dropped "
+                             f"(default: {MAX_QUEUED_BATCHES})")
+    parser.add_argument("--snapshot-interval", type=float, default=SNAPSHOT_INTERVAL,
+                        help=f"seconds between live CSV snapshots (default: {SNAPSHOT_INTERVAL})")
+    parser.add_argument("--udp-buffer", type=int, default=UDP_RECEIVE_BUFFER,
+                        help=f"UDP socket receive buffer in bytes (default: {UDP_RECEIVE_BUFFER})")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="stop after N seconds (default: run until interrupted)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\nReceiver stopped.")
+
+if __name__ == "__main__":
+    main()
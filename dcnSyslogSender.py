@@ -0,0 +1,68 @@
+# 本機測試用 syslog 傳送程式：以 UDP 或 TCP 送出大量合成的 RFC 3164 / RFC 5424 訊息給 dcnSyslogReceiver.py
+import time
+import random
+import socket
+import argparse
+import datetime
+
+SAMPLE_TYPES = [
+    "%LINK-3-UPDOWN", "%LINEPROTO-5-UPDOWN", "%SYS-2-MALLOCFAIL", "%OSPF-4-ERR",
+    "%BGP-5-ADJCHANGE", "%SEC-1-ATTACK", "%SNMP-7-DEBUG", "%PLATFORM-0-CRASH",
+]
+
+def make_messages(count, rfc5424=False, seed=0):
+    rng = random.Random(seed)
+    now = datetime.datetime.now()
+    header_3164 = f"{now:%b} {now.day:2d} {now:%H:%M:%S}"
+    header_5424 = now.astimezone().isoformat(timespec="milliseconds")
+    messages = []
+    for i in range(count):
+        body = (f"{i}: {rng.choice(SAMPLE_TYPES)}: Interface GigabitEthernet0/{rng.randint(0, 48)} "
+                f"changed state to down")
+        if rfc5424:
+            messages.append(f"<189>1 {header_5424} sender-host cisco - - - {body}".encode("utf-8"))
+        else:
+            messages.append(f"<189>{header_3164} sender-host {body}".encode("utf-8"))
+    return messages
+
+def send_udp(messages, host, port, rate):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    interval = 1.0 / rate if rate else 0
+    start = time.perf_counter()
+    for i, message in enumerate(messages):
+        sock.sendto(message, (host, port))
+        if interval:
+            delay = start + (i + 1) * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    sock.close()
+
+def send_tcp(messages, host, port, octet_counting):
+    with socket.create_connection((host, port)) as sock:
+        if octet_counting:
+            payload = b"".join(str(len(m)).encode() + b" " + m for m in messages)
+        else:
+            payload = b"".join(m + b"\n" for m in messages)
+        sock.sendall(payload)
+
+def main():
+    parser = argparse.ArgumentParser(description="send synthetic syslog messages to a local receiver")
+    parser.add_argument("--host", default="127.0.0.1", help="receiver address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=514, help="receiver port (default: 514)")
+    parser.add_argument("--count", type=int, default=50000, help="number of messages (default: 50000)")
+    parser.add_argument("--tcp", action="store_true", help="send over TCP instead of UDP")
+    parser.add_argument("--octet-counting", action="store_true", help="use RFC 6587 octet-counting framing on TCP")
+    parser.add_argument("--rfc5424", action="store_true", help="send RFC 5424 messages instead of RFC 3164")
+    parser.add_argument("--rate", type=float, default=0, help="UDP messages per second (default: unlimited)")
+    args = parser.parse_args()
+    messages = make_messages(args.count, args.rfc5424)
+    start = time.perf_counter()
+    if args.tcp:
+        send_tcp(messages, args.host, args.port, args.octet_counting)
+    else:
+        send_udp(messages, args.host, args.port, args.rate)
+    elapsed = time.perf_counter() - start
+    print(f"sent {args.count} messages in {elapsed:.2f}s ({args.count / elapsed:,.0f} msgs/sec)")
+
+if __name__ == "__main__":
+    main()